@@ -0,0 +1,130 @@
+# accounts/onboarding.py
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from accounts.models import User, Profile
+from accounts.serializers import UserOnboardSerializer
+from app.ingest import chunked
+from app.models import UserVendorRole
+
+ONBOARD_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hash_pool(workers=None):
+    """
+    A thread pool for password hashing; hashlib's PBKDF2 releases the GIL, so
+    threads hash in parallel without forking the web worker.
+
+    Without ``workers`` this is the process-wide pool sized by
+    ``PASSWORD_HASH_WORKERS`` (CPU count by default).
+    """
+    global _pool
+    if workers is not None:
+        return ThreadPoolExecutor(workers, thread_name_prefix="hash")
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                getattr(settings, "PASSWORD_HASH_WORKERS", None) or os.cpu_count(),
+                thread_name_prefix="hash",
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def hash_passwords(passwords, executor=None):
+    """Hashes every password exactly once, spread over ``executor`` when given."""
+    if executor is None or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    return list(executor.map(make_password, passwords))
+
+
+def onboard_users(records, vendor=None, executor=None, batch_size=ONBOARD_BATCH_SIZE,
+                  allow_password_hash=True):
+    """
+    Creates users (and their ``Profile`` when a phone number is given) in bulk.
+
+    ``records`` are ``(line_number, record, error)`` tuples as produced by
+    ``app.ingest.iter_records`` / ``iter_csv_records``. A record carries either a
+    plaintext ``password``, hashed once in ``executor``, or a ``password_hash`` from a
+    legacy system in any format listed in ``PASSWORD_HASHERS``; with neither the
+    account gets an unusable password. Emails that already exist are left as they
+    are. With ``vendor``, the users created become its customers; existing users
+    are not enrolled.
+
+    Without ``allow_password_hash`` records carrying a ``password_hash`` are
+    rejected.
+    """
+    report = {"created": 0, "existing": 0, "failed": 0, "errors": []}
+
+    def fail(number, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": number, "errors": errors})
+
+    for batch in chunked(records, batch_size):
+        rows = {}
+        for number, record, error in batch:
+            if error:
+                fail(number, error)
+                continue
+
+            serializer = UserOnboardSerializer(data=record)
+            if not serializer.is_valid():
+                fail(number, serializer.errors)
+                continue
+
+            data = dict(serializer.validated_data)
+            if data.get("password_hash") and not allow_password_hash:
+                fail(number, {"password_hash": ["Not accepted here; give a plaintext password."]})
+                continue
+            data["email"] = User.objects.normalize_email(data["email"])
+            if data["email"] in rows:
+                fail(number, {"email": "Duplicate email in this upload."})
+                continue
+            rows[data["email"]] = data
+
+        existing = set(User.objects.filter(email__in=rows).values_list("email", flat=True))
+        new = [data for email, data in rows.items() if email not in existing]
+        hashed = iter(hash_passwords([data["password"] for data in new if data.get("password")], executor))
+
+        users, phone_numbers = [], []
+        for data in new:
+            if data.get("password"):
+                password = next(hashed)
+            else:
+                password = data.get("password_hash") or make_password(None)
+            users.append(User(
+                email=data["email"],
+                password=password,
+                first_name=data.get("first_name", ""),
+                last_name=data.get("last_name", ""),
+            ))
+            phone_numbers.append(data.get("phone_number"))
+
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=batch_size)
+            Profile.objects.bulk_create(
+                [Profile(user=user, phone_number=phone) for user, phone in zip(users, phone_numbers) if phone],
+                batch_size=batch_size,
+            )
+            if vendor is not None:
+                UserVendorRole.objects.bulk_create(
+                    [UserVendorRole(user=user, vendor=vendor, role=UserVendorRole.ROLE_CUSTOMER) for user in users],
+                    batch_size=batch_size,
+                )
+
+        report["created"] += len(users)
+        report["existing"] += len(existing)
+
+    return report
@@ -1,6 +1,12 @@
 # accounts/serializers.py
+from django.contrib.auth.hashers import identify_hasher
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
 from accounts.models import User, Profile
+from app.metrics import TimedSerializerMixin
+from app.tokens import add_role_claims
 
 
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -11,14 +17,11 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         fields = ["id", "email", "password", "first_name", "last_name"]
 
     def create(self, validated_data):
-        password = validated_data.pop("password")
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        # create_user hashes the password and saves once.
+        return User.objects.create_user(**validated_data)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "email", "first_name", "last_name"]
@@ -28,4 +31,47 @@ class UserSerializer(serializers.ModelSerializer):
         instance.first_name = validated_data.get("first_name", instance.first_name)
         instance.last_name = validated_data.get("last_name", instance.last_name)
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+
+class UserOnboardSerializer(serializers.Serializer):
+    """One record of a bulk user upload; see ``accounts.onboarding``."""
+
+    email = serializers.EmailField(max_length=254)
+    password = serializers.CharField(required=False, allow_blank=True, write_only=True)
+    password_hash = serializers.CharField(required=False, allow_blank=True, max_length=128, write_only=True)
+    first_name = serializers.CharField(required=False, allow_blank=True, max_length=50)
+    last_name = serializers.CharField(required=False, allow_blank=True, max_length=50)
+    phone_number = serializers.CharField(required=False, allow_blank=True, max_length=15)
+
+    def validate_password_hash(self, password_hash):
+        if password_hash:
+            try:
+                identify_hasher(password_hash)
+            except ValueError:
+                raise serializers.ValidationError("Unknown password hash format.")
+        return password_hash
+
+    def validate(self, attrs):
+        if attrs.get("password") and attrs.get("password_hash"):
+            raise serializers.ValidationError("Give either password or password_hash, not both.")
+        return attrs
+
+
+class TokenObtainPairWithRolesSerializer(TokenObtainPairSerializer):
+    """Token pair carrying the user's vendor roles and role version."""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_role_claims(super().get_token(user), user.pk)
+
+
+class TokenRefreshWithRolesSerializer(TokenRefreshSerializer):
+    """Refreshes the access token with the user's current vendor roles."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data["access"])
+        add_role_claims(access, access[jwt_settings.USER_ID_CLAIM])
+        data["access"] = str(access)
+        return data
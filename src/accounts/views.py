@@ -1,9 +1,12 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from accounts.models import User
 from accounts.serializers import (
+    TokenObtainPairWithRolesSerializer,
+    TokenRefreshWithRolesSerializer,
     UserRegisterSerializer,
     UserSerializer,
 )
@@ -25,16 +28,23 @@ class UserRegisterAPIView(generics.CreateAPIView):
             status=status.HTTP_201_CREATED
         )
 
+class TokenObtainPairWithRolesView(TokenObtainPairView):
+    serializer_class = TokenObtainPairWithRolesSerializer
+
+class TokenRefreshWithRolesView(TokenRefreshView):
+    serializer_class = TokenRefreshWithRolesSerializer
+
 class UserProfileAPIView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # Token authentication gives a claims-only user; load the row.
+        return User.objects.get(pk=self.request.user.pk)
 
 class UserUpdateAPIView(generics.UpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return User.objects.get(pk=self.request.user.pk)
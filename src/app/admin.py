@@ -1,37 +1,157 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import *
 
+# Changelists count at most this many rows exactly; past it, unfiltered lists
+# use the table's row estimate and filtered ones show the cap.
+ADMIN_COUNT_LIMIT = 10000
+
+
+def estimated_rows(model, using):
+    """The planner's row estimate for ``model``'s table, or ``None`` where there is none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == "sqlite":
+                # Filled in by ANALYZE; the first number of a stat is the table's row count.
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    return max(int(str(row[0]).split()[0]), 0)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count never scans more than ``ADMIN_COUNT_LIMIT`` rows.
+
+    Page links past the estimate may come up empty; the rows themselves are
+    still fetched with LIMIT/OFFSET as usual.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        counted = queryset.order_by()[:ADMIN_COUNT_LIMIT + 1].count()
+        if counted <= ADMIN_COUNT_LIMIT or queryset.query.where:
+            return counted
+        return max(estimated_rows(queryset.model, queryset.db) or 0, counted)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows.
+
+    Counts are capped or estimated, and filtered pages skip the extra unfiltered
+    count. Subclasses filter only on indexed choice fields, join what
+    ``list_display`` shows, sort only on indexed columns, and pick related rows
+    with raw-ID or autocomplete widgets instead of a ``<select>`` of the whole table.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 @admin.register(Vendor)
-class VendorAdmin(admin.ModelAdmin):
-    list_display = ( 'domain', 'subdomain')
-    list_filter = ( 'domain', 'subdomain')
-    search_fields = ( 'domain', 'subdomain')
+class VendorAdmin(LargeTableAdmin):
+    list_display = ('store_name', 'user', 'domain', 'subdomain', 'created_at')
+    list_select_related = ('user',)
+    # Also what vendor autocomplete widgets search.
+    search_fields = ('store_name', 'domain', 'subdomain')
+    raw_id_fields = ('user',)
 
 @admin.register(UserVendorRole)
-class UserVendorRoleAdmin(admin.ModelAdmin):
+class UserVendorRoleAdmin(LargeTableAdmin):
     list_display = ('user', 'vendor', 'role')
-    list_filter = ('user', 'vendor', 'role')
-    search_fields = ('user', 'vendor', 'role')
-    ordering = ('user', 'vendor', 'role')
+    list_select_related = ('user', 'vendor')
+    list_filter = ('role',)
+    search_fields = ('=user__email',)
+    raw_id_fields = ('user',)
+    autocomplete_fields = ('vendor',)
+    # The (user, vendor) unique index.
+    ordering = ('user', 'vendor')
+    sortable_by = ()
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('vendor', 'name', 'description', 'price', 'stock', 'is_active')
-    list_filter = ('vendor', 'name', 'description', 'price', 'stock', 'is_active')
-    search_fields = ('vendor', 'name', 'description', 'price', 'stock', 'is_active')
+class ProductAdmin(LargeTableAdmin):
+    list_display = ('name', 'vendor', 'price', 'stock', 'is_active', 'created_at')
+    list_select_related = ('vendor',)
+    list_filter = ('is_active',)
+    search_fields = ('name',)
+    autocomplete_fields = ('vendor',)
+    # The (vendor, name) unique index.
     ordering = ('vendor', 'name')
+    sortable_by = ()
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('customer', 'vendor', 'status', 'total_amount', 'created_at')
-    list_filter = ('customer', 'vendor', 'status', 'total_amount', 'created_at')
-    search_fields = ('customer', 'vendor', 'status', 'total_amount', 'created_at')
-    ordering = ('customer', 'vendor', 'status', 'total_amount', 'created_at')   
-
-@admin.register(OrderItem)    
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ('order', 'product', 'quantity', 'price')
-    list_filter = ('order', 'product', 'quantity', 'price')
-    search_fields = ('order', 'product', 'quantity', 'price')
-    ordering = ('order', 'product', 'quantity', 'price')
+class OrderAdmin(LargeTableAdmin):
+    list_display = ('id', 'customer', 'vendor', 'status', 'total_amount', 'created_at')
+    list_select_related = ('customer', 'vendor')
+    list_filter = ('status',)
+    date_hierarchy = 'created_at'
+    search_fields = ('=customer__email',)
+    raw_id_fields = ('customer',)
+    autocomplete_fields = ('vendor',)
+    # order_created_idx and order_status_created_idx.
+    ordering = ('-created_at', '-id')
+    sortable_by = ('created_at',)
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ('id', 'order', 'product', 'quantity', 'price', 'created_at')
+    # Both are shown by their __str__, which names the vendor.
+    list_select_related = ('order__vendor', 'product__vendor')
+    raw_id_fields = ('order', 'product')
+    ordering = ('-id',)
+    sortable_by = ()
+
+@admin.register(VendorSalesRollup)
+class VendorSalesRollupAdmin(LargeTableAdmin):
+    list_display = ('vendor', 'day', 'status', 'order_count', 'revenue', 'units')
+    list_select_related = ('vendor',)
+    list_filter = ('status',)
+    autocomplete_fields = ('vendor',)
+    # The (vendor, day, status) unique index.
+    ordering = ('vendor', 'day', 'status')
+    sortable_by = ()
+
+@admin.register(VendorShard)
+class VendorShardAdmin(admin.ModelAdmin):
+    list_display = ('vendor', 'alias', 'moving')
+    list_select_related = ('vendor',)
+
+    # Placements change through the move_vendor command, which moves the rows too.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_until')
+    list_filter = ('status',)
+    readonly_fields = ('locked_by', 'locked_until', 'last_error', 'created_at')
+    # task_due_idx.
+    ordering = ('status', 'run_at')
+    sortable_by = ()
+    actions = ['retry_now']
 
+    @admin.action(description="Retry selected tasks now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=Task.STATUS_RUNNING).update(
+            status=Task.STATUS_PENDING, attempts=0, run_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f"{updated} task(s) queued again.")
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from app import notifications, rollups, signals, stock  # noqa: F401  (signal receivers, task handlers)
+        from app.search import create_search_index
+
+        post_migrate.connect(create_search_index, sender=self)
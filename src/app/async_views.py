@@ -0,0 +1,164 @@
+# app/async_views.py
+import math
+
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views import View
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from accounts.models import User
+from app.catalog import acatalog_version
+from app.models import Vendor, UserVendorRole
+from app.pagination import CreatedAtCursorPagination
+from app.roles import arequest_role
+from app.serializers import VendorSerializer, ProductSerializer, OrderSerializer
+from app.throttling import acheck
+from app.tokens import arole_version, is_current
+from app.views import order_queryset, product_queryset
+
+
+async def aauthenticate(request):
+    """
+    Async counterpart of ``ClaimsJWTAuthentication``: a token with a current role
+    version is trusted on its claims, older ones load the user with the async ORM.
+    Sets ``request.auth`` and returns ``None`` without valid credentials.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+
+    try:
+        token = authentication.get_validated_token(raw_token)
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return None
+
+    request.auth = token
+    if is_current(token, await arole_version(user_id)):
+        return jwt_settings.TOKEN_USER_CLASS(token)
+    return await User.objects.filter(**{jwt_settings.USER_ID_FIELD: user_id}, is_active=True).afirst()
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type="application/json")
+
+
+class AsyncTenantView(View):
+    """
+    Read-only async view for tenant-scoped data.
+
+    DRF views are sync, so under ASGI each request holds a thread from the
+    sync_to_async pool. These views authenticate and query with the async ORM and
+    render with the same serializers, so slow clients only hold a coroutine.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await aauthenticate(request)
+        if request.user is None:
+            response = json_response(
+                {"detail": "Authentication credentials were not provided or are invalid."},
+                status.HTTP_401_UNAUTHORIZED,
+            )
+            response["WWW-Authenticate"] = JWTAuthentication().authenticate_header(request)
+            return response
+
+        vendor = getattr(request, "tenant", None)
+        if vendor is not None and (wait := await acheck(vendor.pk, request.user.pk)):
+            response = json_response(
+                {"detail": f"Request was throttled. Expected available in {math.ceil(wait)} seconds."},
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+            response["Retry-After"] = str(math.ceil(wait))
+            return response
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404 as exc:
+            return json_response({"detail": str(exc) or "Not found."}, status.HTTP_404_NOT_FOUND)
+
+    def get_vendor(self):
+        vendor = getattr(self.request, "tenant", None)
+        if vendor is None:
+            raise Http404("Vendor not found")
+        return vendor
+
+    async def get_role(self, vendor):
+        roles = self.__dict__.setdefault("_vendor_roles", {})
+        if vendor.pk not in roles:
+            roles[vendor.pk] = await arequest_role(self.request, vendor)
+        return roles[vendor.pk]
+
+    async def paginate(self, queryset, serializer_class):
+        paginator = CreatedAtCursorPagination()
+        page = await paginator.apaginate_queryset(queryset, self.request)
+        return json_response(paginator.get_paginated_data(serializer_class(page, many=True).data))
+
+    async def get_object(self, queryset, pk):
+        obj = await queryset.filter(pk=pk).afirst()
+        if obj is None:
+            raise Http404("No object matches the given query.")
+        return obj
+
+
+class AsyncCatalogView(AsyncTenantView):
+    """Conditional GET on the catalog version, as ``CatalogConditionalMixin`` does for the sync views."""
+
+    async def get(self, request, *args, **kwargs):
+        vendor = self.get_vendor()
+        version = await acatalog_version(vendor.pk)
+        etag = f'"{vendor.pk}-{version}"'
+        last_modified = version // 10**9
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None or not await self.object_exists(vendor, *args, **kwargs):
+            response = await self.get_catalog(vendor, *args, **kwargs)
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    async def object_exists(self, vendor, *args, **kwargs):
+        return True
+
+
+class AsyncVendorListView(AsyncTenantView):
+    async def get(self, request):
+        vendors = Vendor.objects.filter(user_id=request.user.pk).select_related("user")
+        return await self.paginate(vendors, VendorSerializer)
+
+
+class AsyncProductListView(AsyncCatalogView):
+    async def get_catalog(self, vendor, vendor_id):
+        return await self.paginate(product_queryset(vendor), ProductSerializer)
+
+
+class AsyncProductDetailView(AsyncCatalogView):
+    async def object_exists(self, vendor, vendor_id, pk):
+        return await product_queryset(vendor).filter(pk=pk).aexists()
+
+    async def get_catalog(self, vendor, vendor_id, pk):
+        product = await self.get_object(product_queryset(vendor), pk)
+        return json_response(ProductSerializer(product).data)
+
+
+class AsyncOrderListView(AsyncTenantView):
+    async def get(self, request, vendor_id):
+        vendor = self.get_vendor()
+        orders = order_queryset(vendor)
+        if await self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            orders = orders.filter(customer_id=request.user.pk)
+        return await self.paginate(orders, OrderSerializer)
+
+
+class AsyncOrderDetailView(AsyncTenantView):
+    async def get(self, request, vendor_id, pk):
+        order = await self.get_object(order_queryset(self.get_vendor()), pk)
+        return json_response(OrderSerializer(order).data)
@@ -0,0 +1,23 @@
+# app/caching.py
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+# In-process maps (vendors, shard placements) cannot see other workers'
+# invalidations without a shared cache; they are then reloaded once this many
+# seconds old.
+LOCAL_MAP_MAX_AGE = 5
+
+
+def cache_is_shared(alias="default"):
+    """
+    Whether every worker process sees the same ``alias`` cache.
+
+    A per-process ``LocMemCache`` only counts as shared when
+    ``SINGLE_WORKER_PROCESS`` says one process serves every request. Callers
+    that rely on invalidation through the cache (role versions, role lookups,
+    vendor map versions) fall back to the database when it is not shared.
+    """
+    if isinstance(caches[alias], LocMemCache):
+        return settings.SINGLE_WORKER_PROCESS
+    return True
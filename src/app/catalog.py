@@ -0,0 +1,135 @@
+# app/catalog.py
+import hashlib
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+from app import caching
+
+
+def catalog_version_key(vendor_id):
+    return f"catalog-version:{vendor_id}"
+
+
+def version_timeout():
+    """
+    How long a catalog version is kept: forever in a shared cache.
+
+    Other workers cannot see a bump in a per-process cache, so there versions
+    expire after ``caching.LOCAL_MAP_MAX_AGE`` seconds and start afresh.
+    """
+    return None if caching.cache_is_shared() else caching.LOCAL_MAP_MAX_AGE
+
+
+def catalog_version(vendor_id):
+    """
+    Returns the vendor's catalog version: the ``time.time_ns()`` of its last change.
+
+    Doubles as the catalog's Last-Modified time. A vendor that has not changed
+    since its version was evicted or expired starts a fresh one.
+    """
+    key = catalog_version_key(vendor_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), version_timeout())
+        version = cache.get(key)
+    return version
+
+
+async def acatalog_version(vendor_id):
+    key = catalog_version_key(vendor_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), version_timeout())
+        version = await cache.aget(key)
+    return version
+
+
+def _bump(vendor_ids):
+    now = time.time_ns()
+    cache.set_many({catalog_version_key(vendor_id): now for vendor_id in vendor_ids}, version_timeout())
+
+
+def bump_catalog_version(*vendor_ids):
+    """
+    Marks the vendors' catalogs as changed.
+
+    Bumps right away and again once the surrounding transaction commits, so a
+    reader that picked up the new version before the commit cannot pin the
+    old rows to it.
+    """
+    vendor_ids = set(vendor_ids)
+    if not vendor_ids:
+        return
+    _bump(vendor_ids)
+    transaction.on_commit(lambda: _bump(vendor_ids))
+
+
+# Stampede protection: one request rebuilds a missing entry while the others wait
+# for it, up to REBUILD_WAIT seconds, before building it themselves.
+REBUILD_LOCK_TIMEOUT = 30
+REBUILD_WAIT = 2.0
+REBUILD_POLL = 0.02
+
+
+def catalog_cache():
+    return caches["catalog"]
+
+
+def catalog_response_key(vendor_id, version, request):
+    """Identifies one rendered catalog page: vendor, catalog version, URL and sorted query."""
+    query = sorted((name, sorted(values)) for name, values in request.GET.lists())
+    digest = hashlib.md5(
+        f"{request.get_host()}{request.path}?{query}".encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"catalog-response:{vendor_id}:{version}:{digest}"
+
+
+def response_timeout():
+    """
+    How long a rendered catalog page is kept: the ``catalog`` cache's TIMEOUT.
+
+    Entries go stale through the catalog version alone, which other workers
+    cannot see without a shared default cache; they then live no longer than
+    a version does.
+    """
+    return DEFAULT_TIMEOUT if caching.cache_is_shared() else caching.LOCAL_MAP_MAX_AGE
+
+
+def get_or_build(key, build, timeout=DEFAULT_TIMEOUT):
+    """
+    Returns the cached value for ``key``, calling ``build()`` on a miss.
+
+    Only one caller per key builds at a time, through a ``cache.add`` lock that
+    works on every backend; ``None`` from ``build()`` is returned but not cached.
+    Entries are bounded by ``timeout`` (the ``catalog`` cache's TIMEOUT by
+    default) and its MAX_ENTRIES.
+    """
+    responses = catalog_cache()
+    value = responses.get(key)
+    if value is not None:
+        return value
+
+    lock = f"{key}:lock"
+    if responses.add(lock, 1, REBUILD_LOCK_TIMEOUT):
+        try:
+            value = build()
+            if value is not None:
+                responses.set(key, value, timeout)
+        finally:
+            responses.delete(lock)
+        return value
+
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL)
+        # Lock first: once it is gone, a successful build is already visible.
+        building = responses.get(lock) is not None
+        value = responses.get(key)
+        if value is not None:
+            return value
+        if not building:
+            break
+    return build()
@@ -0,0 +1,87 @@
+# app/exports.py
+import csv
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from app.models import Product, OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+
+PRODUCT_EXPORT_FIELDS = ["id", "name", "description", "price", "stock", "is_active", "created_at"]
+
+ORDER_EXPORT_FIELDS = [
+    "order_id", "created_at", "status", "customer_email",
+    "item_id", "product_id", "product_name", "quantity", "unit_price", "line_total", "order_total",
+]
+
+
+class Echo:
+    """File-like object whose ``write`` hands the value back, for feeding csv.writer into a stream."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def iter_products(vendor, chunk_size=EXPORT_CHUNK_SIZE):
+    return (
+        Product.objects
+        .filter(vendor=vendor)
+        .order_by("id")
+        .values_list(*PRODUCT_EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def parse_day(value):
+    """Turns ``YYYY-MM-DD`` into an aware datetime at local midnight; None passes through."""
+    if not value:
+        return None
+
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"Invalid date: {value!r}")
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def iter_order_lines(vendor, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE, using=None):
+    """
+    Yields one flat row per order line item for ``vendor``, orders created in ``[start, end)``.
+
+    Rows come from a single joined query read through a chunked iterator, so memory
+    stays flat however many orders the range covers. They are read from ``using``,
+    else wherever the router sends the current tenant.
+    """
+    items = OrderItem.objects.using(using).filter(order__vendor=vendor)
+    if start is not None:
+        items = items.filter(order__created_at__gte=start)
+    if end is not None:
+        items = items.filter(order__created_at__lt=end)
+
+    rows = (
+        items
+        # Follows the (vendor, created_at, id) order index; only lines within an order get sorted.
+        .order_by("order__created_at", "order__id", "id")
+        .values_list(
+            "order_id", "order__created_at", "order__status", "order__customer__email",
+            "id", "product_id", "product__name", "quantity", "price", "order__total_amount",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    for *line, quantity, price, order_total in rows:
+        yield (*line, quantity, price, quantity * price, order_total)
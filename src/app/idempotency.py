@@ -0,0 +1,152 @@
+# app/idempotency.py
+import hashlib
+import json
+import time
+
+from django.core.cache import caches
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# The first request with a key holds it for up to LOCK_TIMEOUT seconds (renewed
+# while a streamed response is being written); duplicates poll for its result
+# for up to WAIT seconds before they are answered with 409.
+LOCK_TIMEOUT = 60
+WAIT = 10.0
+POLL = 0.05
+
+
+class IdempotencyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still being processed; try again shortly."
+    default_code = "idempotency_in_progress"
+    wait = 1
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used for a different request."
+    default_code = "idempotency_key_reused"
+
+
+def idempotency_cache():
+    return caches["idempotency"]
+
+
+def result_key(user_id, vendor_id, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{user_id}:{vendor_id}:{digest}"
+
+
+def storable(status_code):
+    # Server errors and throttling say nothing about the request; let a retry run it.
+    return status_code < 500 and status_code != status.HTTP_429_TOO_MANY_REQUESTS
+
+
+def idempotent(request, vendor, respond, payload=None):
+    """
+    Returns ``respond()``, or the stored response of an earlier request with the same key.
+
+    Requests without an ``Idempotency-Key`` header are passed through. A key
+    reused for another method or path, or with a different ``payload`` (the
+    parsed body; streamed uploads pass none), is refused with 422. Results are
+    stored per user, vendor and key in the ``idempotency`` cache, whose TIMEOUT is
+    how long a key is remembered. Only one request per key runs at a time; the
+    others wait for its result instead of repeating its writes. A request that
+    raises stores nothing, so a retry runs it again.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return respond()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValidationError({IDEMPOTENCY_HEADER: [f"Must be 1 to {MAX_KEY_LENGTH} characters long."]})
+
+    fingerprint = _fingerprint(request, payload)
+    results = idempotency_cache()
+    stored_key = result_key(request.user.pk, vendor.pk, key)
+    lock = f"{stored_key}:lock"
+    deadline = time.monotonic() + WAIT
+    while (stored := results.get(stored_key)) is None:
+        if results.add(lock, 1, LOCK_TIMEOUT):
+            # The first request may have finished between the two calls.
+            if (stored := results.get(stored_key)) is None:
+                return _run(fingerprint, respond, results, stored_key, lock)
+            results.delete(lock)
+            break
+        if time.monotonic() >= deadline:
+            raise IdempotencyInProgress()
+        time.sleep(POLL)
+    return _replay(fingerprint, stored)
+
+
+def _fingerprint(request, payload):
+    fingerprint = f"{request.method} {request.path}"
+    if payload is not None:
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        fingerprint += f" {hashlib.sha256(body.encode()).hexdigest()}"
+    return fingerprint
+
+
+def _run(fingerprint, respond, results, stored_key, lock):
+    try:
+        response = respond()
+    except BaseException:
+        results.delete(lock)
+        raise
+
+    record = {"request": fingerprint, "status": response.status_code}
+    if isinstance(response, StreamingHttpResponse):
+        record["content_type"] = response["Content-Type"]
+        response.streaming_content = _record_stream(response.streaming_content, results, stored_key, lock, record)
+        return response
+
+    try:
+        if storable(response.status_code):
+            record["data"] = response.data
+            record["headers"] = {
+                name: value for name, value in response.items() if name.lower() != "content-type"
+            }
+            results.set(stored_key, record)
+    finally:
+        results.delete(lock)
+    return response
+
+
+def _record_stream(chunks, results, stored_key, lock, record):
+    """
+    Passes a streamed response through, storing it once it ends.
+
+    Bulk endpoints stream one result per committed chunk, so a response cut
+    short is stored as far as it got: a retry then reports those rows instead of
+    writing them again.
+    """
+    body = []
+    renewed = time.monotonic()
+    try:
+        for chunk in chunks:
+            body.append(chunk)
+            if time.monotonic() - renewed > LOCK_TIMEOUT / 3:
+                results.touch(lock, LOCK_TIMEOUT)
+                renewed = time.monotonic()
+            yield chunk
+    finally:
+        if body and storable(record["status"]):
+            results.set(stored_key, {**record, "body": b"".join(body)})
+        results.delete(lock)
+
+
+def _replay(fingerprint, stored):
+    if stored["request"] != fingerprint:
+        raise IdempotencyKeyReused()
+    if "body" in stored:
+        response = StreamingHttpResponse(
+            iter([stored["body"]]), status=stored["status"], content_type=stored["content_type"]
+        )
+    else:
+        response = Response(stored["data"], status=stored["status"], headers=stored["headers"])
+    response["Idempotent-Replayed"] = "true"
+    return response
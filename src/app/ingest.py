@@ -0,0 +1,183 @@
+# app/ingest.py
+import csv
+import json
+from itertools import chain, islice
+
+from django.db import router, transaction
+from rest_framework.exceptions import ValidationError
+
+from accounts.models import User
+from app.catalog import bump_catalog_version
+from app.models import Product, Order, OrderItem
+from app.notifications import notify_customers
+from app.rollups import record_orders
+from app.search import index_products
+from app.shards import copy_directory_rows
+from app.serializers import OrderIngestSerializer, ProductSerializer
+
+BULK_CHUNK_SIZE = 500
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_records(lines):
+    """Yields ``(line_number, record, error)`` for every non-blank NDJSON line."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None, "Invalid JSON."
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object."
+            continue
+        yield number, record, None
+
+
+def iter_csv_records(lines):
+    """Yields ``(line_number, record, None)`` for every row of a CSV stream with a header."""
+    reader = csv.DictReader(
+        line.decode("utf-8") if isinstance(line, bytes) else line for line in lines
+    )
+    for record in reader:
+        yield reader.line_num, record, None
+
+
+def ingest_orders(vendor, lines, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Validates and writes an NDJSON order feed for ``vendor``, one chunk at a time.
+
+    Yields one result per record, so neither the feed nor the results are ever held
+    in memory in full.
+    """
+    for chunk in chunked(iter_records(lines), chunk_size):
+        yield from _ingest_chunk(vendor, chunk)
+
+
+def _referenced_ids(records):
+    product_ids, customer_ids = set(), set()
+    for record in records:
+        if isinstance(record.get("customer"), int):
+            customer_ids.add(record["customer"])
+        items = record.get("items")
+        for item in items if isinstance(items, list) else ():
+            if isinstance(item, dict) and isinstance(item.get("product"), int):
+                product_ids.add(item["product"])
+    return product_ids, customer_ids
+
+
+def _ingest_chunk(vendor, chunk):
+    product_ids, customer_ids = _referenced_ids(record for _, record, _ in chunk if record)
+    context = {
+        "vendor": vendor,
+        "products": Product.objects.filter(vendor=vendor, is_active=True).in_bulk(product_ids),
+        "customers": set(User.objects.filter(pk__in=customer_ids).values_list("pk", flat=True)),
+    }
+
+    results, placed = [], []
+    using = router.db_for_write(Order)
+    with transaction.atomic(using=using):
+        for number, record, error in chunk:
+            if error:
+                results.append({"line": number, "status": "error", "errors": error})
+                continue
+
+            serializer = OrderIngestSerializer(data=record, context=context)
+            if not serializer.is_valid():
+                results.append({"line": number, "status": "error", "errors": serializer.errors})
+                continue
+
+            data = dict(serializer.validated_data)
+            items_data = data.pop("items")
+            try:
+                OrderIngestSerializer.reserve_items(items_data)
+            except ValidationError as exc:
+                results.append({"line": number, "status": "error", "errors": exc.detail})
+                continue
+
+            order = Order(vendor=vendor, total_amount=OrderIngestSerializer.order_total(items_data), **data)
+            result = {"line": number, "status": "created"}
+            results.append(result)
+            placed.append((result, order, items_data))
+
+        # Bulk inserts skip pre_save, which copies customers onto the vendor's shard.
+        copy_directory_rows(using, user_ids={order.customer_id for _, order, _ in placed})
+        Order.objects.bulk_create(order for _, order, _ in placed)
+        OrderItem.objects.bulk_create(chain.from_iterable(
+            OrderIngestSerializer.build_items(order, items_data) for _, order, items_data in placed
+        ))
+        record_orders(
+            (order, OrderIngestSerializer.order_units(items_data)) for _, order, items_data in placed
+        )
+        notify_customers(order for _, order, _ in placed)
+
+    for result, order, _ in placed:
+        result["id"] = order.pk
+    return results
+
+
+def import_products(vendor, records, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Upserts catalog rows for ``vendor`` on the ``(vendor, name)`` key.
+
+    ``records`` are ``(line_number, record, error)`` tuples as produced by
+    ``iter_records`` / ``iter_csv_records``. Each batch costs one lookup of the
+    existing names plus one ``INSERT ... ON CONFLICT DO UPDATE`` per distinct set of
+    supplied columns, and only the supplied columns are overwritten.
+    """
+    report = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def fail(number, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": number, "errors": errors})
+
+    for batch in chunked(records, batch_size):
+        rows = {}
+        for number, record, error in batch:
+            if error:
+                fail(number, error)
+                continue
+
+            serializer = ProductSerializer(data=record)
+            if not serializer.is_valid():
+                fail(number, serializer.errors)
+                continue
+
+            data = serializer.validated_data
+            # Later rows for the same name win, as they would with one POST per row.
+            if data["name"] in rows:
+                report["updated"] += 1
+            rows[data["name"]] = data
+
+        existing = set(
+            Product.objects.filter(vendor=vendor, name__in=rows).values_list("name", flat=True)
+        )
+        report["updated"] += len(existing)
+        report["created"] += len(rows) - len(existing)
+
+        groups = {}
+        for data in rows.values():
+            groups.setdefault(tuple(sorted(data)), []).append(Product(vendor=vendor, **data))
+
+        with transaction.atomic(using=router.db_for_write(Product)):
+            for fields, products in groups.items():
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=["vendor", "name"],
+                    update_fields=[field for field in fields if field != "name"] or ["name"],
+                )
+            # Bulk upserts skip post_save, so do its work for the batch here.
+            index_products(Product.objects.filter(vendor=vendor, name__in=rows))
+            bump_catalog_version(vendor.pk)
+
+    return report
@@ -0,0 +1,88 @@
+# app/management/commands/bench_async.py
+import asyncio
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.test import AsyncClient
+from django.test.utils import override_settings
+
+from app.management.commands.benchmark import BENCHMARK_THROTTLE_RATES, Command as BenchmarkCommand, percentile
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Fires concurrent requests through the ASGI handler at the sync DRF read endpoints "
+        "and their async counterparts, and compares throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--vendor", type=int, help="Vendor to exercise; defaults to the first one with orders.")
+        parser.add_argument(
+            "--response-cache", action="store_true",
+            help="Keep the catalog response cache on; by default both paths read the database.",
+        )
+
+    def handle(self, *args, **options):
+        self.sample = self.load_sample(options)
+        # AsyncClient always sends Host: testserver.
+        overrides = {
+            "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"],
+            "TENANT_THROTTLE_RATES": BENCHMARK_THROTTLE_RATES,
+            "TENANT_THROTTLE_QUOTAS": {},
+        }
+        if not options["response_cache"]:
+            overrides["CACHES"] = {
+                **settings.CACHES,
+                "catalog": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+            }
+
+        with override_settings(**overrides):
+            for name, user, sync_url, async_url in self.endpoints():
+                headers = {"Authorization": f"Bearer {self.access_token(user)}"}
+                for label, url in (("sync", sync_url), ("async", async_url)):
+                    result = async_to_sync(self.run)(url, headers, options["requests"], options["concurrency"])
+                    self.stdout.write(
+                        f"{name:16} {label:5}  {result['rps']:8.1f} req/s  p50 {result['p50_ms']:8.2f}ms  "
+                        f"p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms"
+                    )
+
+    def endpoints(self):
+        s = self.sample
+        vendor, product, order = s["vendor"].pk, s["product"].pk, s["order"].pk
+        pairs = [
+            ("vendor-list", s["owner"], "vendor-list-create", "vendor-list-async", {}),
+            ("product-list", s["customer"], "product-list-create", "product-list-async", {"vendor_id": vendor}),
+            ("product-detail", s["customer"], "product-detail", "product-detail-async",
+             {"vendor_id": vendor, "pk": product}),
+            ("order-list", s["owner"], "order-list-create", "order-list-async", {"vendor_id": vendor}),
+            ("order-detail", s["owner"], "order-detail", "order-detail-async", {"vendor_id": vendor, "pk": order}),
+        ]
+        for name, user, sync_name, async_name, kwargs in pairs:
+            yield name, user, self.url_for(sync_name, kwargs), self.url_for(async_name, kwargs)
+
+    async def run(self, url, headers, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        timings = []
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await AsyncClient().get(url, headers=headers)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"{url} answered {response.status_code}: {response.content[:200]!r}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+        return {
+            "rps": total / elapsed,
+            "p50_ms": percentile(timings, 50),
+            "p95_ms": percentile(timings, 95),
+            "p99_ms": percentile(timings, 99),
+        }
@@ -0,0 +1,77 @@
+# app/management/commands/bench_checkout.py
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from rest_framework.exceptions import ValidationError
+
+from accounts.models import User
+from app.models import Vendor, Product, Order, OrderItem
+from app.serializers import OrderSerializer
+
+
+class Command(BaseCommand):
+    help = "Runs concurrent checkouts against a single hot product and checks that stock never oversells."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--attempts", type=int, default=500, help="Total checkout attempts.")
+        parser.add_argument("--stock", type=int, default=200)
+        parser.add_argument("--quantity", type=int, default=1, help="Units per checkout.")
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark vendor and orders.")
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        customer = User.objects.create_user(f"bench-{tag}@example.com")
+        vendor = Vendor.objects.create(user=customer, store_name=f"bench-{tag}")
+        product = Product.objects.create(vendor=vendor, name="hot sku", price=1, stock=options["stock"])
+
+        counts = {"placed": 0, "rejected": 0, "errors": 0}
+        lock = threading.Lock()
+
+        def checkout(_):
+            data = {"items": [{"product": product.pk, "quantity": options["quantity"]}]}
+            serializer = OrderSerializer(data=data, context={"vendor": vendor})
+            try:
+                serializer.is_valid(raise_exception=True)
+                serializer.save(customer=customer, vendor=vendor)
+                outcome = "placed"
+            except ValidationError:
+                outcome = "rejected"
+            except OperationalError:
+                outcome = "errors"
+            finally:
+                connection.close()
+            with lock:
+                counts[outcome] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+            list(pool.map(checkout, range(options["attempts"])))
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        sold = OrderItem.objects.filter(product=product).aggregate(total=Sum("quantity"))["total"] or 0
+
+        self.stdout.write(
+            f"threads={options['threads']} attempts={options['attempts']} "
+            f"placed={counts['placed']} rejected={counts['rejected']} errors={counts['errors']}"
+        )
+        self.stdout.write(
+            f"stock {options['stock']} -> {product.stock}, sold {sold}; "
+            f"{options['attempts'] / elapsed:.1f} checkouts/s, {counts['placed'] / elapsed:.1f} orders/s"
+        )
+
+        consistent = sold + product.stock == options["stock"] and sold <= options["stock"]
+
+        if not options["keep"]:
+            Order.objects.filter(vendor=vendor).delete()
+            customer.delete()
+
+        if not consistent:
+            raise CommandError("Stock accounting mismatch: the product was oversold.")
+        self.stdout.write(self.style.SUCCESS("No oversell."))
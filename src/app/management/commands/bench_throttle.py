@@ -0,0 +1,53 @@
+# app/management/commands/bench_throttle.py
+import statistics
+import time
+
+from django.test.utils import override_settings
+
+from app.management.commands.benchmark import BENCHMARK_THROTTLE_RATES, Command as BenchmarkCommand, percentile
+from app.throttling import check, throttle_cache
+
+NO_LIMITS = {"vendor": None, "user": None}
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Measures what TenantRateThrottle adds per request: the two bucket updates on their own, "
+        "and the product list with and without limits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--users", type=int, default=1000, help="Distinct users spread over the user buckets.")
+        parser.add_argument("--vendor", type=int, help="Vendor to exercise; defaults to the first one with orders.")
+
+    def handle(self, *args, **options):
+        self.sample = self.load_sample(options)
+        vendor = self.sample["vendor"]
+        iterations, users = options["iterations"], options["users"]
+
+        with override_settings(TENANT_THROTTLE_RATES=BENCHMARK_THROTTLE_RATES, TENANT_THROTTLE_QUOTAS={}):
+            throttle_cache().clear()
+            timings = []
+            for i in range(iterations * 50):
+                started = time.perf_counter()
+                check(vendor.pk, i % users)
+                timings.append((time.perf_counter() - started) * 1_000_000)
+        self.stdout.write(
+            f"{'check()':34} p50 {percentile(timings, 50):8.2f}us  p99 {percentile(timings, 99):8.2f}us  "
+            f"mean {statistics.fmean(timings):8.2f}us"
+        )
+
+        scenario = ("product-list-create", "get", self.sample["customer"], {"vendor_id": vendor.pk}, "", None)
+        results = {}
+        for key, rates in (("product-list GET, no limits", NO_LIMITS), ("product-list GET, throttled", BENCHMARK_THROTTLE_RATES)):
+            with override_settings(TENANT_THROTTLE_RATES=rates, TENANT_THROTTLE_QUOTAS={}):
+                results[key] = self.measure(scenario, iterations, options["warmup"])
+            self.stdout.write(self.format_row(key, results[key]))
+
+        off, on = results.values()
+        self.stdout.write(self.style.SUCCESS(
+            f"Throttle overhead: {(on['p50_ms'] - off['p50_ms']) * 1000:+.0f}us at p50, "
+            f"{(on['mean_ms'] - off['mean_ms']) * 1000:+.0f}us on average per request."
+        ))
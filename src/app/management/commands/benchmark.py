@@ -0,0 +1,294 @@
+# app/management/commands/benchmark.py
+import json
+import math
+import re
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+import accounts.urls
+from accounts.serializers import TokenObtainPairWithRolesSerializer
+import app.urls
+from app.models import Vendor, UserVendorRole, Product, Order
+from app.shards import using_vendor, vendor_db
+
+URL_MODULES = [("/app/", app.urls), ("/accounts/", accounts.urls)]
+
+ROUTE_PARAM_RE = re.compile(r"<(?:\w+:)?(\w+)>")
+
+# Keeps the tenant throttle on the request path without refusing repeated requests.
+BENCHMARK_THROTTLE_RATES = {"vendor": "1000000/s", "user": "1000000/s"}
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives every URL in app/urls.py and accounts/urls.py through the test client against "
+        "the current database and reports p50/p95/p99 latency, queries per request and peak memory. "
+        "Writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--vendor", type=int, help="Vendor to exercise; defaults to the first one with orders.")
+        parser.add_argument("--password", default="load-test-pass", help="Password of the sample customer, for login.")
+        parser.add_argument("--only", help="Regex on scenario names to run.")
+        parser.add_argument("--save", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Compare against a JSON file written by --save.")
+        parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p95 slowdown, as a fraction.")
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        self.sample = self.load_sample(options)
+        scenarios = self.scenarios(options)
+        # Before --only, so that only URLs without any scenario are reported.
+        self.report_unexercised_urls(scenarios)
+        if options["only"]:
+            scenarios = {k: v for k, v in scenarios.items() if re.search(options["only"], k)}
+
+        results = {}
+        with override_settings(TENANT_THROTTLE_RATES=BENCHMARK_THROTTLE_RATES, TENANT_THROTTLE_QUOTAS={}):
+            for key, scenario in scenarios.items():
+                results[key] = self.measure(scenario, options["iterations"], options["warmup"])
+                self.stdout.write(self.format_row(key, results[key]))
+
+        if options["save"]:
+            with open(options["save"], "w") as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(f"Saved results to {options['save']}")
+
+        if options["baseline"]:
+            regressions = self.compare(results, options["baseline"], options["threshold"])
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"{len(regressions)} scenario(s) regressed: {', '.join(regressions)}")
+
+    def load_sample(self, options):
+        vendors = Vendor.objects.all()
+        if options["vendor"]:
+            vendors = vendors.filter(pk=options["vendor"])
+        vendor = vendors.filter(orders__isnull=False).first() or vendors.first()
+        if vendor is None:
+            raise CommandError("No vendor found; run generate_data first.")
+
+        # Requests also touch the vendor's shard, when it has moved to one.
+        self.databases = {DEFAULT_DB_ALIAS, vendor_db(vendor.pk)}
+        with using_vendor(vendor.pk):
+            order = (
+                Order.objects.filter(vendor=vendor)
+                .exclude(status=Order.STATUS_CANCELLED)
+                .select_related("customer")
+                .first()
+            )
+            product = Product.objects.filter(vendor=vendor, is_active=True).order_by("-stock").first()
+        if order is None or product is None:
+            raise CommandError(f"Vendor {vendor.pk} needs at least one product and one order.")
+
+        staff_role = UserVendorRole.objects.filter(
+            vendor=vendor, role=UserVendorRole.ROLE_STAFF
+        ).select_related("user").first()
+
+        return {
+            "vendor": vendor,
+            "owner": vendor.user,
+            "staff": staff_role.user if staff_role else vendor.user,
+            "customer": order.customer,
+            "order": order,
+            "product": product,
+        }
+
+    def client_for(self, user):
+        client = Client(HTTP_HOST="localhost")
+        if user is not None:
+            client.defaults["HTTP_AUTHORIZATION"] = f"Bearer {self.access_token(user)}"
+        return client
+
+    def access_token(self, user):
+        # Issued once per user, outside the measured requests.
+        tokens = self.__dict__.setdefault("_tokens", {})
+        if user.pk not in tokens:
+            tokens[user.pk] = TokenObtainPairWithRolesSerializer.get_token(user).access_token
+        return tokens[user.pk]
+
+    def scenarios(self, options):
+        s = self.sample
+        vendor, product, order = s["vendor"], s["product"], s["order"]
+        ids = {"vendor_id": vendor.pk}
+        search_term = product.name.split()[0]
+        products_ndjson = "\n".join(
+            json.dumps({"name": f"Benchmark product {i}", "price": "9.99", "stock": 5}) for i in range(50)
+        )
+        orders_ndjson = "\n".join(
+            json.dumps({"customer": s["customer"].pk, "items": [{"product": product.pk, "quantity": 1}]})
+            for _ in range(20)
+        )
+        customers_ndjson = "\n".join(
+            json.dumps({"email": f"benchmark-customer-{i}@example.com", "password": "benchmark-pass"})
+            for i in range(5)
+        )
+        refresh = str(TokenObtainPairWithRolesSerializer.get_token(s["customer"]))
+
+        # scenario -> (URL name, method, user, URL kwargs, query string or body, content type)
+        return {
+            "vendor-list-create GET": ("vendor-list-create", "get", s["owner"], {}, "", None),
+            "vendor-list-create POST": ("vendor-list-create", "post", s["owner"], {}, {"store_name": "Benchmark"}, "json"),
+            "product-list-create GET": ("product-list-create", "get", s["customer"], ids, "", None),
+            "product-list-create POST": ("product-list-create", "post", s["staff"], ids,
+                                         {"name": "Benchmark product", "price": "1.00", "stock": 1}, "json"),
+            "product-detail GET": ("product-detail", "get", s["customer"], {**ids, "pk": product.pk}, "", None),
+            "product-detail PATCH": ("product-detail", "patch", s["staff"], {**ids, "pk": product.pk},
+                                     {"stock": product.stock + 1}, "json"),
+            "product-search GET": ("product-search", "get", s["customer"], ids, f"q={search_term}", None),
+            "product-export GET": ("product-export", "get", s["owner"], ids, "", None),
+            "product-import POST": ("product-import", "post", s["owner"], ids, products_ndjson, "application/x-ndjson"),
+            "order-list-create GET": ("order-list-create", "get", s["owner"], ids, "", None),
+            "order-list-create GET customer": ("order-list-create", "get", s["customer"], ids, "", None),
+            "order-list-create POST": ("order-list-create", "post", s["customer"], ids,
+                                       {"items": [{"product": product.pk, "quantity": 1}]}, "json"),
+            "order-detail GET": ("order-detail", "get", s["owner"], {**ids, "pk": order.pk}, "", None),
+            "order-detail PATCH": ("order-detail", "patch", s["staff"], {**ids, "pk": order.pk},
+                                   {"status": Order.STATUS_SHIPPED}, "json"),
+            "order-bulk-create POST": ("order-bulk-create", "post", s["owner"], ids, orders_ndjson, "application/x-ndjson"),
+            "order-export GET": ("order-export", "get", s["owner"], ids, "", None),
+            "vendor-sales-dashboard GET": ("vendor-sales-dashboard", "get", s["owner"], ids, "", None),
+            "vendor-list-async GET": ("vendor-list-async", "get", s["owner"], {}, "", None),
+            "product-list-async GET": ("product-list-async", "get", s["customer"], ids, "", None),
+            "product-detail-async GET": ("product-detail-async", "get", s["customer"], {**ids, "pk": product.pk}, "", None),
+            "order-list-async GET": ("order-list-async", "get", s["owner"], ids, "", None),
+            "order-detail-async GET": ("order-detail-async", "get", s["owner"], {**ids, "pk": order.pk}, "", None),
+            "assign-vendor-role POST": ("assign-vendor-role", "post", s["owner"], ids,
+                                        {"user_id": s["customer"].pk, "role": UserVendorRole.ROLE_CUSTOMER}, "json"),
+            "customer-import POST": ("customer-import", "post", s["owner"], ids, customers_ndjson,
+                                     "application/x-ndjson"),
+            "register POST": ("register", "post", None, {},
+                              {"email": "benchmark-user@example.com", "password": "benchmark-pass"}, "json"),
+            "token_obtain_pair POST": ("token_obtain_pair", "post", None, {},
+                                       {"email": s["customer"].email, "password": options["password"]}, "json"),
+            "token_refresh POST": ("token_refresh", "post", None, {}, {"refresh": refresh}, "json"),
+            "user-profile GET": ("user-profile", "get", s["customer"], {}, "", None),
+            "user-update PATCH": ("user-update", "patch", s["customer"], {}, {"first_name": "Bench"}, "json"),
+        }
+
+    def url_for(self, name, kwargs):
+        for prefix, module in URL_MODULES:
+            for pattern in module.urlpatterns:
+                if pattern.name == name:
+                    route = ROUTE_PARAM_RE.sub(lambda m: str(kwargs[m.group(1)]), str(pattern.pattern))
+                    return prefix + route
+        raise CommandError(f"No URL named {name!r}")
+
+    def report_unexercised_urls(self, scenarios):
+        covered = {scenario[0] for scenario in scenarios.values()}
+        for _, module in URL_MODULES:
+            for pattern in module.urlpatterns:
+                if pattern.name not in covered:
+                    self.stdout.write(self.style.WARNING(f"No benchmark scenario for URL {pattern.name!r}"))
+
+    def request(self, scenario):
+        name, method, user, kwargs, payload, content_type = scenario
+        url = self.url_for(name, kwargs)
+        client = self.client_for(user)
+
+        if method == "get":
+            response = client.get(f"{url}?{payload}" if payload else url)
+        elif content_type == "json":
+            response = getattr(client, method)(url, json.dumps(payload), content_type="application/json")
+        else:
+            response = getattr(client, method)(url, payload, content_type=content_type)
+
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def run_once(self, scenario):
+        """Runs one request inside transactions that are always rolled back."""
+        response = None
+        try:
+            with ExitStack() as stack:
+                for using in self.databases:
+                    stack.enter_context(transaction.atomic(using=using))
+                response = self.request(scenario)
+                raise Rollback
+        except Rollback:
+            pass
+        if response.status_code >= 400:
+            raise CommandError(f"{scenario[0]} answered {response.status_code}: {response.content[:200]!r}")
+        return response
+
+    def measure(self, scenario, iterations, warmup):
+        for _ in range(warmup):
+            self.run_once(scenario)
+
+        timings, query_counts = [], []
+        for _ in range(iterations):
+            with ExitStack() as stack:
+                captured = [stack.enter_context(CaptureQueriesContext(connections[using])) for using in self.databases]
+                started = time.perf_counter()
+                self.run_once(scenario)
+                timings.append((time.perf_counter() - started) * 1000)
+            # Transaction bookkeeping added by the rollback wrapper is not part of the endpoint.
+            query_counts.append(sum(
+                1 for queries in captured for q in queries.captured_queries
+                if not q["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK", "BEGIN"))
+            ))
+
+        # Memory is traced in a separate pass so tracing overhead does not skew latency.
+        tracemalloc.start()
+        self.run_once(scenario)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "queries": max(query_counts),
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def format_row(self, key, result):
+        return (
+            f"{key:34} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+            f"p99 {result['p99_ms']:8.2f}ms  queries {result['queries']:4}  peak {result['peak_kb']:9.1f}KiB"
+        )
+
+    def compare(self, results, path, threshold):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+
+        self.stdout.write(f"\nCompared with {path}:")
+        regressions = []
+        for key, result in results.items():
+            before = baseline.get(key)
+            if before is None:
+                self.stdout.write(f"{key:34} (new)")
+                continue
+
+            ratio = result["p95_ms"] / before["p95_ms"] if before["p95_ms"] else 1.0
+            regressed = ratio > 1 + threshold or result["queries"] > before["queries"]
+            line = (
+                f"{key:34} p95 {before['p95_ms']:8.2f} -> {result['p95_ms']:8.2f}ms ({ratio - 1:+.0%})  "
+                f"queries {before['queries']} -> {result['queries']}"
+            )
+            if regressed:
+                regressions.append(key)
+                self.stdout.write(self.style.ERROR(f"{line}  REGRESSED"))
+            else:
+                self.stdout.write(line)
+        return regressions
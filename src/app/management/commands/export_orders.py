@@ -0,0 +1,43 @@
+# app/management/commands/export_orders.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.exports import ORDER_EXPORT_FIELDS, iter_order_lines, parse_day, stream_csv, stream_ndjson
+from app.models import Vendor
+from app.shards import using_vendor
+
+
+class Command(BaseCommand):
+    help = "Exports one row per order line for a vendor and date range, streaming to a file or stdout."
+
+    def add_arguments(self, parser):
+        parser.add_argument("vendor_id", type=int)
+        parser.add_argument("--start", help="First day to include (YYYY-MM-DD).")
+        parser.add_argument("--end", help="First day to exclude (YYYY-MM-DD).")
+        parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+        parser.add_argument("--output", help="File to write; defaults to stdout.")
+        parser.add_argument("--database", help="Read from this database, e.g. a replica; defaults to the vendor's shard.")
+
+    def handle(self, *args, **options):
+        try:
+            vendor = Vendor.objects.get(pk=options["vendor_id"])
+        except Vendor.DoesNotExist:
+            raise CommandError(f"Vendor {options['vendor_id']} does not exist.")
+
+        try:
+            start = parse_day(options["start"])
+            end = parse_day(options["end"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        stream = stream_csv if options["format"] == "csv" else stream_ndjson
+        chunks = stream(ORDER_EXPORT_FIELDS, iter_order_lines(vendor, start, end, using=options["database"]))
+
+        # The rows are read as the chunks are written.
+        with using_vendor(vendor.pk):
+            if options["output"]:
+                with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                    output.writelines(chunks)
+            else:
+                sys.stdout.writelines(chunks)
@@ -0,0 +1,180 @@
+# app/management/commands/generate_data.py
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from app.models import Vendor, UserVendorRole, Product, Order, OrderItem
+from app.rollups import rebuild_rollups
+from app.search import rebuild_search_index, uses_fts
+from app.tenants import tenant_map
+
+# Share of orders with 1, 2, 3, ... line items; long tail up to 20 lines.
+LINE_COUNT_WEIGHTS = [40, 22, 13, 8, 5, 3, 2, 2, 1, 1, 1, 0.5, 0.5, 0.4, 0.3, 0.2, 0.2, 0.1, 0.1, 0.1]
+
+STATUS_WEIGHTS = {
+    Order.STATUS_COMPLETED: 55,
+    Order.STATUS_SHIPPED: 15,
+    Order.STATUS_PAID: 12,
+    Order.STATUS_PENDING: 10,
+    Order.STATUS_CANCELLED: 8,
+}
+
+
+class Command(BaseCommand):
+    help = "Generates a synthetic multi-tenant dataset with bulk inserts for load and latency testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vendors", type=int, default=5)
+        parser.add_argument("--products", type=int, default=500, help="Products per vendor.")
+        parser.add_argument("--orders", type=int, default=5000, help="Orders per vendor.")
+        parser.add_argument("--customers", type=int, default=1000, help="Customer accounts, shared across vendors.")
+        parser.add_argument("--staff", type=int, default=2, help="Staff accounts per vendor.")
+        parser.add_argument("--vendors-per-customer", type=int, default=2)
+        parser.add_argument("--days", type=int, default=180, help="Spread order dates over this many days.")
+        parser.add_argument("--password", default="load-test-pass", help="Password for every generated user.")
+        parser.add_argument("--prefix", default="load", help="Prefix for generated emails and store names.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        prefix = options["prefix"]
+        started = time.perf_counter()
+
+        # Hash once; every generated account shares the same password.
+        password = make_password(options["password"])
+
+        with transaction.atomic():
+            owners = self.create_users(password, [f"{prefix}-owner{i}@example.com" for i in range(options["vendors"])])
+            vendors = Vendor.objects.bulk_create(
+                [
+                    Vendor(user=owner, store_name=f"{prefix} store {i}", subdomain=f"{prefix}-store-{i}")
+                    for i, owner in enumerate(owners)
+                ],
+                batch_size=self.batch_size,
+            )
+            staff = self.create_users(password, [
+                f"{prefix}-staff{v}-{i}@example.com" for v in range(len(vendors)) for i in range(options["staff"])
+            ])
+            customers = self.create_users(password, [
+                f"{prefix}-customer{i}@example.com" for i in range(options["customers"])
+            ])
+
+            members = self.create_roles(vendors, owners, staff, customers, options)
+            products = self.create_products(vendors, options["products"])
+            order_count, item_count = self.create_orders(vendors, products, members, options)
+
+        # Bulk inserts skip model signals: refresh what they would have maintained.
+        tenant_map.invalidate()
+        rebuild_rollups([vendor.pk for vendor in vendors])
+        if uses_fts():
+            rebuild_search_index()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(vendors)} vendors, {len(owners) + len(staff) + len(customers)} users, "
+            f"{sum(len(p) for p in products.values())} products, {order_count} orders and "
+            f"{item_count} order items in {time.perf_counter() - started:.1f}s."
+        ))
+
+    def create_users(self, password, emails):
+        return User.objects.bulk_create(
+            [User(email=email, password=password) for email in emails], batch_size=self.batch_size
+        )
+
+    def create_roles(self, vendors, owners, staff, customers, options):
+        roles, members = [], {}
+        per_vendor_staff = options["staff"]
+
+        for v, (vendor, owner) in enumerate(zip(vendors, owners)):
+            roles.append(UserVendorRole(user=owner, vendor=vendor, role=UserVendorRole.ROLE_OWNER))
+            for user in staff[v * per_vendor_staff:(v + 1) * per_vendor_staff]:
+                roles.append(UserVendorRole(user=user, vendor=vendor, role=UserVendorRole.ROLE_STAFF))
+            members[vendor.pk] = []
+
+        k = min(options["vendors_per_customer"], len(vendors))
+        for customer in customers:
+            for vendor in self.rng.sample(vendors, k):
+                roles.append(UserVendorRole(user=customer, vendor=vendor, role=UserVendorRole.ROLE_CUSTOMER))
+                members[vendor.pk].append(customer)
+
+        UserVendorRole.objects.bulk_create(roles, batch_size=self.batch_size)
+        return members
+
+    def create_products(self, vendors, per_vendor):
+        products = {}
+        for vendor in vendors:
+            products[vendor.pk] = Product.objects.bulk_create(
+                [
+                    Product(
+                        vendor=vendor,
+                        name=f"Product {i}",
+                        description=f"Synthetic product {i} for {vendor.store_name}",
+                        price=Decimal(self.rng.randint(100, 50000)) / 100,
+                        stock=self.rng.randint(0, 1000),
+                        is_active=self.rng.random() > 0.05,
+                    )
+                    for i in range(per_vendor)
+                ],
+                batch_size=self.batch_size,
+            )
+        return products
+
+    def create_orders(self, vendors, products, members, options):
+        now = timezone.now()
+        span = datetime.timedelta(days=options["days"]).total_seconds()
+        line_counts = range(1, len(LINE_COUNT_WEIGHTS) + 1)
+        statuses, status_weights = zip(*STATUS_WEIGHTS.items())
+        order_count = item_count = 0
+
+        for vendor in vendors:
+            catalog = products[vendor.pk]
+            customers = members[vendor.pk]
+            if not catalog or not customers:
+                continue
+            # Zipf-like popularity: a few products get most of the sales.
+            popularity = [1 / (rank + 1) for rank in range(len(catalog))]
+
+            remaining = options["orders"]
+            while remaining:
+                size = min(remaining, self.batch_size)
+                remaining -= size
+
+                orders, lines = [], []
+                for _ in range(size):
+                    line_count = self.rng.choices(line_counts, LINE_COUNT_WEIGHTS)[0]
+                    picked = list(dict.fromkeys(self.rng.choices(catalog, popularity, k=line_count)))
+                    quantities = [self.rng.choice((1, 1, 1, 2, 2, 3, 5)) for _ in picked]
+                    orders.append(Order(
+                        customer=self.rng.choice(customers),
+                        vendor=vendor,
+                        status=self.rng.choices(statuses, status_weights)[0],
+                        total_amount=sum(q * p.price for q, p in zip(quantities, picked)),
+                    ))
+                    lines.append(list(zip(picked, quantities)))
+
+                Order.objects.bulk_create(orders, batch_size=self.batch_size)
+
+                # auto_now_add stamps every row with "now"; spread the history afterwards.
+                for order in orders:
+                    order.created_at = now - datetime.timedelta(seconds=self.rng.random() * span)
+                Order.objects.bulk_update(orders, ["created_at"], batch_size=self.batch_size)
+
+                items = [
+                    OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+                    for order, order_lines in zip(orders, lines)
+                    for product, quantity in order_lines
+                ]
+                OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+
+                order_count += len(orders)
+                item_count += len(items)
+
+        return order_count, item_count
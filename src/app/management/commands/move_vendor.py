@@ -0,0 +1,146 @@
+# app/management/commands/move_vendor.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from app import caching
+from app.catalog import bump_catalog_version
+from app.ingest import chunked
+from app.models import Vendor, VendorShard, Order
+from app.search import reindex_vendor
+from app.shards import (
+    TENANT_MODELS, copy_directory_rows, kept_id_sequences, shard_aliases, tenant_rows, upsert_rows, vendor_db,
+)
+
+MOVE_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves a vendor's products, orders and sales rollups to another shard while it stays online. "
+        "Rows are copied while writes continue; writes are then paused for a catch-up sync, the shard "
+        "map is switched and the rows are deleted from the old shard. Reads are served throughout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("vendor_id", type=int)
+        parser.add_argument("target", help="Database to move to, e.g. shard1 or default.")
+        parser.add_argument("--batch-size", type=int, default=MOVE_BATCH_SIZE)
+        parser.add_argument(
+            "--drain-seconds", type=float, default=5.0,
+            help="Time given to in-flight requests when writes are paused and after the switch.",
+        )
+
+    def handle(self, *args, **options):
+        vendor_id, target = options["vendor_id"], options["target"]
+        if not Vendor.objects.using(DEFAULT_DB_ALIAS).filter(pk=vendor_id).exists():
+            raise CommandError(f"Vendor {vendor_id} does not exist.")
+        if target not in shard_aliases():
+            raise CommandError(f"Unknown shard {target!r}; configured: {', '.join(shard_aliases())}.")
+        source = vendor_db(vendor_id)
+        if source == target:
+            raise CommandError(f"Vendor {vendor_id} is already on {target}.")
+        self.batch_size = options["batch_size"]
+        drain = options["drain_seconds"]
+        if not caching.cache_is_shared():
+            # Other workers only see the new placement once their map expires.
+            drain += caching.LOCAL_MAP_MAX_AGE
+
+        copy_directory_rows(target, vendor_ids=[vendor_id])
+        copied = self.sync(vendor_id, source, target)
+        self.stdout.write(f"Copied {copied} rows to {target}; pausing writes for the catch-up.")
+
+        self.place(vendor_id, source, moving=True)
+        try:
+            time.sleep(drain)
+            changed = self.sync(vendor_id, source, target)
+            reindex_vendor(vendor_id, target)
+            self.place(vendor_id, target)
+        except BaseException:
+            self.place(vendor_id, source)
+            raise
+        bump_catalog_version(vendor_id)
+        self.stdout.write(f"Caught up {changed} rows; vendor {vendor_id} is served from {target}.")
+
+        # Requests routed before the switch may still be reading the old shard.
+        time.sleep(drain)
+        deleted = self.purge(vendor_id, source)
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved vendor {vendor_id} from {source} to {target} and deleted {deleted} rows from {source}."
+        ))
+
+    def place(self, vendor_id, alias, moving=False):
+        placements = VendorShard.objects.using(DEFAULT_DB_ALIAS)
+        if alias == DEFAULT_DB_ALIAS and not moving:
+            placements.filter(vendor_id=vendor_id).delete()
+        else:
+            placements.update_or_create(vendor_id=vendor_id, defaults={"alias": alias, "moving": moving})
+
+    def sync(self, vendor_id, source, target):
+        """Makes the vendor's rows on ``target`` match ``source``; returns the rows written or deleted."""
+        changed, stale = 0, {}
+        for model in TENANT_MODELS:
+            written, stale[model] = self.sync_rows(model, vendor_id, source, target)
+            changed += written
+        for model in reversed(TENANT_MODELS):
+            for pks in chunked(stale[model], self.batch_size):
+                model._base_manager.using(target).filter(pk__in=pks).delete()
+                changed += len(pks)
+        return changed
+
+    def sync_rows(self, model, vendor_id, source, target):
+        """
+        Upserts the rows of ``model`` that differ, one primary key range at a time.
+
+        Returns the number written and the primary keys of ``target`` rows that
+        are no longer on ``source``.
+        """
+        fields = [field.attname for field in model._meta.concrete_fields]
+        pk_index = fields.index(model._meta.pk.attname)
+        source_rows = tenant_rows(model, vendor_id, source).order_by("pk")
+        target_rows = tenant_rows(model, vendor_id, target)
+
+        written, stale, last = 0, [], 0
+        while True:
+            batch = list(source_rows.filter(pk__gt=last)[:self.batch_size])
+            in_range = target_rows.filter(pk__gt=last)
+            if batch:
+                in_range = in_range.filter(pk__lte=batch[-1].pk)
+            current = {values[pk_index]: values for values in in_range.values_list(*fields)}
+
+            new = [obj.pk for obj in batch if obj.pk not in current]
+            changed = [
+                obj for obj in batch
+                if current.pop(obj.pk, None) != tuple(getattr(obj, field) for field in fields)
+            ]
+            stale.extend(current)
+
+            if new and model._base_manager.using(target).filter(pk__in=new).exists():
+                raise CommandError(
+                    f"{model.__name__} ids of vendor {vendor_id} are already used by other rows on {target}."
+                )
+            if changed:
+                if model is Order:
+                    copy_directory_rows(target, user_ids={order.customer_id for order in changed})
+                # Copied ids come from the source's range; no insert on the
+                # target may allocate from there in between.
+                with transaction.atomic(using=target), kept_id_sequences(target, [model]):
+                    upsert_rows(target, model, changed)
+                written += len(changed)
+
+            if not batch:
+                return written, stale
+            last = batch[-1].pk
+
+    def purge(self, vendor_id, source):
+        deleted = 0
+        for model in reversed(TENANT_MODELS):
+            rows = tenant_rows(model, vendor_id, source)
+            while pks := list(rows.values_list("pk", flat=True)[:self.batch_size]):
+                model._base_manager.using(source).filter(pk__in=pks).delete()
+                deleted += len(pks)
+        if source != DEFAULT_DB_ALIAS:
+            # The directory copy; the vendor itself stays on the default database.
+            Vendor.objects.using(source).filter(pk=vendor_id).delete()
+        return deleted
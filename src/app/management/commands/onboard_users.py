@@ -0,0 +1,47 @@
+# app/management/commands/onboard_users.py
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.onboarding import ONBOARD_BATCH_SIZE, hash_pool, onboard_users
+from app.ingest import iter_csv_records, iter_records
+from app.models import Vendor
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates users in bulk from a CSV (with a header row) or NDJSON file. Columns: email, "
+        "password or password_hash, first_name, last_name, phone_number."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--vendor", type=int, help="Also make every user a customer of this vendor.")
+        parser.add_argument("--workers", type=int, help="Hashing threads; defaults to the CPU count.")
+        parser.add_argument("--batch-size", type=int, default=ONBOARD_BATCH_SIZE)
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension.")
+
+    def handle(self, *args, **options):
+        vendor = None
+        if options["vendor"]:
+            try:
+                vendor = Vendor.objects.get(pk=options["vendor"])
+            except Vendor.DoesNotExist:
+                raise CommandError(f"Vendor {options['vendor']} does not exist.")
+
+        fmt = options["format"] or ("csv" if options["path"].endswith(".csv") else "ndjson")
+        started = time.perf_counter()
+
+        # A pool of its own, shut down with the command.
+        pool = hash_pool(options["workers"] or os.cpu_count())
+        with open(options["path"], newline="", encoding="utf-8") as lines, pool:
+            records = iter_csv_records(lines) if fmt == "csv" else iter_records(lines)
+            report = onboard_users(records, vendor=vendor, executor=pool, batch_size=options["batch_size"])
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} users, skipped {report['existing']} existing and "
+            f"{report['failed']} invalid in {time.perf_counter() - started:.1f}s."
+        ))
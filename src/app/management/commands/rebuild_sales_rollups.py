@@ -0,0 +1,20 @@
+# app/management/commands/rebuild_sales_rollups.py
+from django.core.management.base import BaseCommand
+
+from app.rollups import rebuild_rollups
+from app.shards import shard_aliases
+
+
+class Command(BaseCommand):
+    help = "Recomputes the per-day sales rollups from orders, for all vendors or the given ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("vendor_ids", nargs="*", type=int)
+        parser.add_argument("--database", help="Only rebuild on this database; defaults to every shard.")
+
+    def handle(self, *args, **options):
+        rows = sum(
+            rebuild_rollups(options["vendor_ids"] or None, using=using)
+            for using in ([options["database"]] if options["database"] else shard_aliases())
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rollup rows."))
@@ -0,0 +1,22 @@
+# app/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from app.search import create_search_index, rebuild_search_index, uses_fts
+
+
+class Command(BaseCommand):
+    help = "Recreates the product full-text index from the product table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        if not uses_fts(using):
+            self.stdout.write("Full-text index is only used on SQLite; nothing to rebuild.")
+            return
+
+        create_search_index(using)
+        rebuild_search_index(using)
+        self.stdout.write(self.style.SUCCESS("Product search index rebuilt."))
@@ -0,0 +1,65 @@
+# app/management/commands/run_tasks.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from app.shards import shard_aliases
+from app.tasks import TASK_LEASE_SECONDS, claim, run
+
+
+def run_claimed(item, using):
+    # Each pool thread has its own connections; drop any the database has closed meanwhile.
+    close_old_connections()
+    return run(item, using)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued tasks (order mails, stock releases, sales rollups) from every shard. "
+        "Tasks are leased, so several workers can run side by side and a crashed worker's "
+        "tasks are picked up again once their lease expires."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Tasks run at the same time.")
+        parser.add_argument("--batch", type=int, default=50, help="Tasks leased per database per poll.")
+        parser.add_argument("--lease", type=int, default=TASK_LEASE_SECONDS, help="Seconds a task may run before it is retried.")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to sleep when no task is due.")
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due.")
+        parser.add_argument(
+            "--database", action="append", dest="databases",
+            help="Only run tasks queued on this database; may be repeated. Defaults to every shard.",
+        )
+
+    def handle(self, *args, **options):
+        databases = options["databases"] or shard_aliases()
+        unknown = set(databases) - set(shard_aliases())
+        if unknown:
+            raise CommandError(f"Unknown database(s): {', '.join(sorted(unknown))}.")
+
+        ok = failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            try:
+                while True:
+                    futures = [
+                        pool.submit(run_claimed, item, using)
+                        for using in databases
+                        for item in claim(using, options["batch"], options["lease"])
+                    ]
+                    for future in futures:
+                        if future.result():
+                            ok += 1
+                        else:
+                            failed += 1
+                    if futures:
+                        continue
+                    if options["once"]:
+                        break
+                    close_old_connections()
+                    time.sleep(options["poll"])
+            except KeyboardInterrupt:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {ok + failed} tasks: {ok} succeeded, {failed} failed."))
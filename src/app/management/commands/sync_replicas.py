@@ -0,0 +1,32 @@
+# app/management/commands/sync_replicas.py
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the SQLite primary onto the DATABASE_REPLICAS files, standing in for "
+        "replication when trying read replicas locally."
+    )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured; set DATABASE_REPLICAS to a comma-separated list of files.")
+
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("Only SQLite files can be synced; other databases replicate on their own.")
+
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            if replica.vendor != "sqlite":
+                raise CommandError(f"Replica {alias!r} is not SQLite.")
+            replica.close()
+            with sqlite3.connect(replica.settings_dict["NAME"]) as target:
+                primary.connection.backup(target)
+            target.close()
+            self.stdout.write(self.style.SUCCESS(f"Synced {alias} ({replica.settings_dict['NAME']})."))
@@ -0,0 +1,194 @@
+# app/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from rest_framework import serializers
+
+# Upper bounds in seconds, as in the Prometheus client libraries.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _ViewStats:
+    __slots__ = (
+        "buckets", "count", "seconds", "queries", "db_seconds", "serialize_seconds", "render_seconds", "statuses",
+    )
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    """
+    Per-process request metrics keyed by ``(URL name, method)``.
+
+    Every worker process keeps its own registry; Prometheus scrapes each worker
+    and sums the series. Recording is a handful of additions under one lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, method, status, seconds, queries, db_seconds, serialize_seconds, render_seconds):
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            stats = self._views.get((view, method))
+            if stats is None:
+                stats = self._views[(view, method)] = _ViewStats()
+            stats.buckets[bucket] += 1
+            stats.count += 1
+            stats.seconds += seconds
+            stats.queries += queries
+            stats.db_seconds += db_seconds
+            stats.serialize_seconds += serialize_seconds
+            stats.render_seconds += render_seconds
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    "buckets": list(stats.buckets),
+                    "count": stats.count,
+                    "seconds": stats.seconds,
+                    "queries": stats.queries,
+                    "db_seconds": stats.db_seconds,
+                    "serialize_seconds": stats.serialize_seconds,
+                    "render_seconds": stats.render_seconds,
+                    "statuses": dict(stats.statuses),
+                }
+                for key, stats in self._views.items()
+            }
+
+    def render(self):
+        """Formats the registry in the Prometheus text exposition format."""
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family("http_request_duration_seconds", "histogram", "Request latency by URL name.")
+        for (view, method), stats in snapshot:
+            labels = f'view="{_escape(view)}",method="{method}"'
+            cumulative = 0
+            for bound, hits in zip(LATENCY_BUCKETS, stats["buckets"]):
+                cumulative += hits
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats['seconds']}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {stats['count']}")
+
+        family("http_requests_total", "counter", "Requests by URL name and response status.")
+        for (view, method), stats in snapshot:
+            for status, hits in sorted(stats["statuses"].items()):
+                lines.append(
+                    f'http_requests_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {hits}'
+                )
+
+        for name, key, help_text in (
+            ("db_queries_total", "queries", "Database queries run while serving requests."),
+            ("db_query_duration_seconds_total", "db_seconds", "Time spent in database queries."),
+            (
+                "serializer_duration_seconds_total", "serialize_seconds",
+                "Time spent building serializer data, queries included.",
+            ),
+            ("response_render_duration_seconds_total", "render_seconds", "Time spent rendering response bodies."),
+        ):
+            family(name, "counter", help_text)
+            for (view, method), stats in snapshot:
+                lines.append(f'{name}{{view="{_escape(view)}",method="{method}"}} {stats[key]}')
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+
+class SerializationTimer:
+    """Time one request spent in ``serializer.data``; nested calls count once."""
+
+    __slots__ = ("seconds", "depth")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.depth = 0
+
+
+_serialization = ContextVar("serialization", default=None)
+
+
+def start_serialization_timer():
+    """Starts timing ``serializer.data`` for the current request; ``MetricsMiddleware`` reads the result."""
+    timer = SerializationTimer()
+    _serialization.set(timer)
+    return timer
+
+
+def stop_serialization_timer():
+    _serialization.set(None)
+
+
+@contextmanager
+def timed_serialization():
+    timer = _serialization.get()
+    if timer is None or timer.depth:
+        yield
+        return
+    timer.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.seconds += time.perf_counter() - started
+        timer.depth -= 1
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Counts ``.data`` towards the request's serialization time.
+
+    Set ``Meta.list_serializer_class = TimedListSerializer`` for ``many=True`` too.
+    """
+
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; only answers addresses listed in ``INTERNAL_IPS``."""
+    if request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        raise Http404
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,192 @@
+# app/middleware.py
+import heapq
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import DisallowedHost
+from django.db import connections
+from django.http.request import split_domain_port
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from app.metrics import registry, start_serialization_timer, stop_serialization_timer
+from app.routers import replica_reads
+from app.shards import set_tenant
+from app.tenants import tenant_map
+
+logger = logging.getLogger("app.performance")
+
+
+class TenantMiddleware(MiddlewareMixin):
+    """
+    Resolves the vendor for the request once and attaches it as ``request.tenant``.
+
+    The ``vendor_id`` URL kwarg wins; otherwise the Host header is matched against
+    ``Vendor.domain`` / ``Vendor.subdomain``. Tenant models are then routed to
+    the vendor's shard.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.tenant = self.resolve(request, view_kwargs)
+        set_tenant(request.tenant)
+        return None
+
+    def resolve(self, request, view_kwargs):
+        vendor_id = view_kwargs.get("vendor_id")
+        if vendor_id is not None:
+            return tenant_map.get(vendor_id)
+
+        try:
+            host, _ = split_domain_port(request.get_host())
+        except DisallowedHost:
+            host = None
+        return tenant_map.get_by_host(host)
+
+
+class ReplicaReadMiddleware:
+    """
+    Lets safe-method requests read from ``DATABASE_REPLICAS``.
+
+    Writes always go to the primary, and once a request has written, its
+    remaining reads follow (see ``app.routers.ReplicaRouter``).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.method not in SAFE_METHODS:
+            return self.get_response(request)
+        with replica_reads():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method not in SAFE_METHODS:
+            return await self.get_response(request)
+        with replica_reads():
+            return await self.get_response(request)
+
+
+class QueryTimer:
+    """
+    ``execute_wrapper`` hook that counts and times the queries of one request.
+
+    When ``keep`` is set, the ``keep`` slowest statements are retained for the
+    slow request log.
+    """
+
+    __slots__ = ("queries", "db_seconds", "keep", "slowest")
+
+    def __init__(self, keep=0):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.keep = keep
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_seconds += elapsed
+            if self.keep:
+                entry = (elapsed, self.queries, sql)
+                if len(self.slowest) < self.keep:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heappushpop(self.slowest, entry)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, query count, database time, serialization time and render
+    time per URL name.
+
+    Goes first in ``MIDDLEWARE`` so the whole stack is measured. Streaming
+    responses are measured up to the first byte. Requests slower than
+    ``SLOW_REQUEST_SECONDS`` are logged to ``app.performance`` with their
+    ``SLOW_REQUEST_TOP_QUERIES`` slowest statements.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        started, timer, serialization = self.start(request)
+        with self.timing_queries(timer):
+            response = self.get_response(request)
+        self.finish(request, response, started, timer, serialization)
+        return response
+
+    async def __acall__(self, request):
+        started, timer, serialization = self.start(request)
+        with self.timing_queries(timer):
+            response = await self.get_response(request)
+        self.finish(request, response, started, timer, serialization)
+        return response
+
+    def start(self, request):
+        threshold = settings.SLOW_REQUEST_SECONDS
+        timer = QueryTimer(settings.SLOW_REQUEST_TOP_QUERIES if threshold is not None else 0)
+        request._render_seconds = 0.0
+        return time.perf_counter(), timer, start_serialization_timer()
+
+    def timing_queries(self, timer):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def finish(self, request, response, started, timer, serialization):
+        elapsed = time.perf_counter() - started
+        stop_serialization_timer()
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+
+        registry.record(
+            view, request.method, response.status_code, elapsed,
+            timer.queries, timer.db_seconds, serialization.seconds, request._render_seconds,
+        )
+
+        threshold = settings.SLOW_REQUEST_SECONDS
+        if threshold is not None and elapsed >= threshold:
+            statements = "".join(
+                f"\n  {seconds * 1000:.1f}ms  {sql}"
+                for seconds, _, sql in sorted(timer.slowest, reverse=True)
+            )
+            logger.warning(
+                "Slow request %s %s (%s): %.1fms, %d queries in %.1fms, serialize %.1fms, render %.1fms%s",
+                request.method, request.path, view, elapsed * 1000, timer.queries, timer.db_seconds * 1000,
+                serialization.seconds * 1000, request._render_seconds * 1000, statements,
+            )
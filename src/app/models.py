@@ -1,7 +1,29 @@
 from django.db import models
+from django.utils import timezone
 from accounts.models import User
 # app/models.py
 
+
+class TenantQuerySet(models.QuerySet):
+    """
+    Inserts new rows with ids from their database's own range; see ``app.shards.allocate_ids``.
+
+    Covers ``save()`` (through ``Meta.base_manager_name``) and ``bulk_create``.
+    """
+
+    def _insert(self, objs, fields, returning_fields=None, raw=False, using=None, **kwargs):
+        pk = self.model._meta.pk
+        if not raw and pk not in fields:
+            from app.shards import allocate_ids  # app.shards imports the models
+
+            ids = allocate_ids(using or self.db, self.model, len(objs))
+            if ids is not None:
+                for obj, id_ in zip(objs, ids):
+                    obj.pk = id_
+                fields = [pk, *fields]
+        return super()._insert(objs, fields, returning_fields, raw, using, **kwargs)
+
+
 class Vendor(models.Model):
     user        = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_vendors')  
     store_name  = models.CharField(max_length=255)
@@ -9,6 +31,11 @@ class Vendor(models.Model):
     subdomain   = models.CharField(max_length=255, blank=True, null=True)
     created_at  = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='vendor_user_created_idx'),
+        ]
+
     def __str__(self):
         return self.store_name
 
@@ -30,6 +57,10 @@ class UserVendorRole(models.Model):
 
     class Meta:
         unique_together = ('user', 'vendor')
+        indexes = [
+            # Covers role lookups so they are answered from the index alone.
+            models.Index(fields=['user', 'vendor', 'role'], name='vendor_role_lookup_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} → {self.vendor.store_name} ({self.role})"
@@ -44,8 +75,15 @@ class Product(models.Model):
     is_active   = models.BooleanField(default=True)
     created_at  = models.DateTimeField(auto_now_add=True)
 
+    objects = TenantQuerySet.as_manager()
+
     class Meta:
+        base_manager_name = 'objects'
         unique_together = ('vendor', 'name')
+        indexes = [
+            models.Index(fields=['vendor', '-created_at', '-id'], name='product_vendor_created_idx'),
+            models.Index(fields=['vendor', 'is_active'], name='product_vendor_active_idx'),
+        ]
 
     def __str__(self):
         return f"{self.vendor.store_name} - {self.name}"
@@ -71,8 +109,18 @@ class Order(models.Model):
     total_amount    = models.DecimalField(max_digits=10, decimal_places=2)
     created_at      = models.DateTimeField(auto_now_add=True)
 
+    objects = TenantQuerySet.as_manager()
+
     class Meta:
+        base_manager_name = 'objects'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['vendor', '-created_at', '-id'], name='order_vendor_created_idx'),
+            models.Index(fields=['vendor', 'customer', '-created_at', '-id'], name='order_vendor_customer_idx'),
+            # The admin's newest-first changelist, date hierarchy and status filter.
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.vendor.store_name}"
@@ -84,8 +132,84 @@ class OrderItem(models.Model):
     price       = models.DecimalField(max_digits=10, decimal_places=2)
     created_at  = models.DateTimeField(auto_now_add=True)
 
+    objects = TenantQuerySet.as_manager()
+
     class Meta:
+        base_manager_name = 'objects'
         ordering = ['-created_at']
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+
+class VendorSalesRollup(models.Model):
+    """Orders, revenue and units sold per vendor, local day and order status."""
+
+    vendor      = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='sales_rollups')
+    day         = models.DateField()
+    status      = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.PositiveIntegerField(default=0)
+    revenue     = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units       = models.PositiveIntegerField(default=0)
+
+    objects = TenantQuerySet.as_manager()
+
+    class Meta:
+        base_manager_name = 'objects'
+        # Also serves the dashboard's (vendor, day range) scan.
+        unique_together = ('vendor', 'day', 'status')
+        ordering = ['day', 'status']
+
+    def __str__(self):
+        return f"{self.vendor.store_name} {self.day} {self.status}"
+
+
+class VendorShard(models.Model):
+    """Where a vendor's tenant data lives; vendors without a row use the default database."""
+
+    vendor  = models.OneToOneField(Vendor, on_delete=models.CASCADE, primary_key=True, related_name='placement')
+    alias   = models.CharField(max_length=100)
+    # Set while the vendor is being moved; its writes are refused until the move ends.
+    moving  = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.vendor_id} → {self.alias}"
+
+
+class Task(models.Model):
+    """
+    Deferred work, written in the same transaction as the change that calls for it.
+
+    Rows live on the database of that change (the vendor's shard for order side
+    effects) and are deleted once their handler succeeds; see ``app.tasks``.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    name         = models.CharField(max_length=100)
+    payload      = models.JSONField(default=dict)
+    status       = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts     = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at       = models.DateTimeField(default=timezone.now)
+    locked_by    = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error   = models.TextField(blank=True)
+    created_at   = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Due tasks and expired leases, oldest first.
+            models.Index(fields=['status', 'run_at'], name='task_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
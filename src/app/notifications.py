@@ -0,0 +1,37 @@
+# app/notifications.py
+from django.core.mail import send_mass_mail
+from django.db import router
+
+from app.models import Order
+from app.shards import using_vendor
+from app.tasks import enqueue, task
+
+
+def notify_customers(orders):
+    """Queues a status mail to the customer of each of ``orders``, all from one vendor."""
+    orders = list(orders)
+    if orders:
+        enqueue(
+            "orders.notify",
+            using=router.db_for_write(Order),
+            vendor_id=orders[0].vendor_id,
+            order_ids=[order.pk for order in orders],
+        )
+
+
+@task("orders.notify")
+def send_status_mails(vendor_id, order_ids):
+    """Mails each customer the current status of their order; a retry may repeat some mails."""
+    with using_vendor(vendor_id):
+        orders = list(Order.objects.filter(pk__in=order_ids).select_related("customer", "vendor"))
+
+    send_mass_mail([
+        (
+            f"Order #{order.pk} from {order.vendor.store_name}: {order.get_status_display()}",
+            f"Hi {order.customer.first_name or order.customer.email},\n\n"
+            f"Your order #{order.pk} ({order.total_amount}) is now {order.get_status_display().lower()}.\n",
+            None,
+            [order.customer.email],
+        )
+        for order in orders
+    ])
@@ -0,0 +1,75 @@
+# app/roles.py
+from django.conf import settings
+from django.core.cache import cache
+
+from app.caching import cache_is_shared
+from app.models import UserVendorRole
+from app.tokens import claimed_roles
+
+# Cached marker for "user has no role in this vendor", so misses are cached too.
+NO_ROLE = ""
+
+
+def _pk(obj):
+    return getattr(obj, "pk", obj)
+
+
+def role_cache_key(user_id, vendor_id):
+    return f"vendor-role:{user_id}:{vendor_id}"
+
+
+def _role(user, vendor):
+    return UserVendorRole.objects.filter(user_id=_pk(user), vendor_id=_pk(vendor)).values_list("role", flat=True)
+
+
+def get_user_role(user, vendor):
+    """
+    The user's role in ``vendor``, or ``None``; cached for ``ROLE_CACHE_TIMEOUT``.
+
+    Role changes drop the entry through the default cache, so it is only used
+    when that cache is shared by every worker (see ``app.caching``).
+    """
+    if not cache_is_shared():
+        return _role(user, vendor).first()
+
+    key = role_cache_key(_pk(user), _pk(vendor))
+    role = cache.get(key)
+
+    if role is None:
+        role = _role(user, vendor).first() or NO_ROLE
+        cache.set(key, role, getattr(settings, "ROLE_CACHE_TIMEOUT", 300))
+
+    return role or None
+
+
+async def aget_user_role(user, vendor):
+    if not cache_is_shared():
+        return await _role(user, vendor).afirst()
+
+    key = role_cache_key(_pk(user), _pk(vendor))
+    role = await cache.aget(key)
+
+    if role is None:
+        role = await _role(user, vendor).afirst() or NO_ROLE
+        await cache.aset(key, role, getattr(settings, "ROLE_CACHE_TIMEOUT", 300))
+
+    return role or None
+
+
+def request_role(request, vendor):
+    """The requesting user's role in ``vendor``, from the token's claims when they are current."""
+    roles = claimed_roles(request)
+    if roles is not None:
+        return roles.get(str(_pk(vendor)))
+    return get_user_role(request.user, vendor)
+
+
+async def arequest_role(request, vendor):
+    roles = claimed_roles(request)
+    if roles is not None:
+        return roles.get(str(_pk(vendor)))
+    return await aget_user_role(request.user, vendor)
+
+
+def invalidate_user_role(user_id, vendor_id):
+    cache.delete(role_cache_key(user_id, vendor_id))
@@ -0,0 +1,136 @@
+# app/rollups.py
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from app.models import Order, OrderItem, VendorSalesRollup
+from app.shards import using_vendor
+from app.tasks import enqueue, task
+
+
+def _apply(deltas):
+    """
+    Adds ``{(vendor_id, day, status): (orders, revenue, units)}`` to the rollups.
+
+    Each key is one UPDATE with relative increments, or an INSERT for a new
+    day/status; a concurrent INSERT of the same row turns into an UPDATE.
+    """
+    for (vendor_id, day, status), (orders, revenue, units) in deltas.items():
+        if not (orders or revenue or units):
+            continue
+
+        row = VendorSalesRollup.objects.filter(vendor_id=vendor_id, day=day, status=status)
+        increments = dict(
+            order_count=F("order_count") + orders,
+            revenue=F("revenue") + revenue,
+            units=F("units") + units,
+        )
+        if row.update(**increments):
+            continue
+
+        try:
+            with transaction.atomic(using=router.db_for_write(VendorSalesRollup)):
+                VendorSalesRollup.objects.create(
+                    vendor_id=vendor_id, day=day, status=status,
+                    order_count=orders, revenue=revenue, units=units,
+                )
+        except IntegrityError:
+            row.update(**increments)
+
+
+def _queue(deltas):
+    """
+    Queues ``deltas`` for ``apply_deltas`` next to the orders that caused them.
+
+    The task commits with the orders and applies in the worker's transaction on
+    the same database, so each change is counted once without holding up the request.
+    """
+    rows = [
+        [vendor_id, day.isoformat(), status, orders, str(revenue), units]
+        for (vendor_id, day, status), (orders, revenue, units) in deltas.items()
+    ]
+    if rows:
+        enqueue("rollups.apply", using=router.db_for_write(VendorSalesRollup), deltas=rows)
+
+
+@task("rollups.apply")
+def apply_deltas(deltas):
+    by_vendor = defaultdict(dict)
+    for vendor_id, day, status, orders, revenue, units in deltas:
+        by_vendor[vendor_id][(vendor_id, date.fromisoformat(day), status)] = (orders, Decimal(revenue), units)
+    for vendor_id, vendor_deltas in by_vendor.items():
+        with using_vendor(vendor_id):
+            _apply(vendor_deltas)
+
+
+def record_orders(orders):
+    """Queues new orders, given as ``(order, units)`` pairs, to be counted into the rollups."""
+    deltas = defaultdict(lambda: [0, Decimal(0), 0])
+    for order, units in orders:
+        delta = deltas[(order.vendor_id, timezone.localdate(order.created_at), order.status)]
+        delta[0] += 1
+        delta[1] += order.total_amount
+        delta[2] += units
+    _queue(deltas)
+
+
+def move_order(order, old_status, new_status, units):
+    """Queues moving an order between status buckets of its day."""
+    day = timezone.localdate(order.created_at)
+    _queue({
+        (order.vendor_id, day, old_status): (-1, -order.total_amount, -units),
+        (order.vendor_id, day, new_status): (1, order.total_amount, units),
+    })
+
+
+def rebuild_rollups(vendor_ids=None, using=DEFAULT_DB_ALIAS):
+    """
+    Recomputes the rollups from ``Order`` and ``OrderItem``, for backfills and repairs.
+
+    Orders and units are aggregated separately so line items do not multiply
+    order totals. Works on one database (shard) at a time. Returns the number of
+    rows written.
+    """
+    orders = Order.objects.using(using)
+    items = OrderItem.objects.using(using)
+    rollups = VendorSalesRollup.objects.using(using)
+    if vendor_ids:
+        orders = orders.filter(vendor_id__in=vendor_ids)
+        items = items.filter(order__vendor_id__in=vendor_ids)
+        rollups = rollups.filter(vendor_id__in=vendor_ids)
+
+    tz = timezone.get_current_timezone()
+    with transaction.atomic(using=using):
+        totals = (
+            orders.order_by()
+            .values("vendor_id", "status", day=TruncDate("created_at", tzinfo=tz))
+            .annotate(order_count=Count("id"), revenue=Sum("total_amount"))
+        )
+        units = {
+            (row["vendor_id"], row["day"], row["status"]): row["units"]
+            for row in (
+                items.order_by()
+                .values(vendor_id=F("order__vendor_id"), status=F("order__status"),
+                        day=TruncDate("order__created_at", tzinfo=tz))
+                .annotate(units=Sum("quantity"))
+            )
+        }
+        rows = [
+            VendorSalesRollup(
+                vendor_id=row["vendor_id"],
+                day=row["day"],
+                status=row["status"],
+                order_count=row["order_count"],
+                revenue=row["revenue"],
+                units=units.get((row["vendor_id"], row["day"], row["status"]), 0),
+            )
+            for row in totals
+        ]
+        rollups.delete()
+        VendorSalesRollup.objects.using(using).bulk_create(rows, batch_size=1000)
+    return len(rows)
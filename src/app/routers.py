@@ -0,0 +1,121 @@
+# app/routers.py
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from app.shards import TENANT_LABELS, Placement, VendorMoving, current_tenant, shard_map, vendor_of
+
+_reads = ContextVar("replica_reads", default=None)
+
+
+class ReplicaReads:
+    """Routing state of one request: its replica, and ``pinned`` once it has written."""
+
+    __slots__ = ("replica", "pinned")
+
+    def __init__(self):
+        self.replica = None
+        self.pinned = False
+
+
+@contextmanager
+def replica_reads():
+    """
+    Lets reads in the block go to ``DATABASE_REPLICAS``.
+
+    The state is shared with threads the block hands work to (``sync_to_async``
+    copies the context), so a write there pins the rest of the block as well.
+    """
+    token = _reads.set(ReplicaReads())
+    try:
+        yield
+    finally:
+        _reads.reset(token)
+
+
+def pin_primary():
+    """Sends the remaining reads of the current block to the primary."""
+    state = _reads.get()
+    if state is not None:
+        state.pinned = True
+
+
+class ReplicaRouter:
+    """
+    Primary/replica routing.
+
+    Reads go to a replica only inside ``replica_reads()``, outside a transaction
+    and before the first write of the block; everything else, including
+    management commands and ``select_for_update``, uses the primary. A block
+    sticks to one randomly chosen replica so its reads do not mix replication lags.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _reads.get()
+        replicas = settings.DATABASE_REPLICAS
+        if state is None or state.pinned or not replicas:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica not in replicas:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ShardRouter:
+    """
+    Pins tenant-scoped models (``app.shards.TENANT_MODELS``) to their vendor's shard.
+
+    The vendor comes from the model instance when Django passes one, otherwise
+    from the current tenant (see ``app.shards.set_tenant``). Vendors on the
+    default database, and every other model, are left to the next router. Writes
+    for a vendor that is being moved raise ``VendorMoving``.
+    """
+
+    def _placement(self, model, hints):
+        if model._meta.label_lower not in TENANT_LABELS:
+            return None
+
+        tenant = current_tenant()
+        instance = hints.get("instance")
+        vendor_id = vendor_of(instance) if instance is not None else None
+        if vendor_id is not None and (tenant is None or tenant.vendor_id != vendor_id):
+            return shard_map.get(vendor_id)
+        if tenant is None and instance is not None and instance._state.db in settings.DATABASE_SHARDS:
+            # e.g. the items of an order loaded from a shard.
+            return Placement(instance._state.db)
+        return tenant.placement if tenant is not None else None
+
+    def db_for_read(self, model, **hints):
+        placement = self._placement(model, hints)
+        if placement is None or placement.alias == DEFAULT_DB_ALIAS:
+            return None
+        return placement.alias
+
+    def db_for_write(self, model, **hints):
+        placement = self._placement(model, hints)
+        if placement is None:
+            return None
+        if placement.moving:
+            raise VendorMoving()
+        return None if placement.alias == DEFAULT_DB_ALIAS else placement.alias
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards get the full schema; they hold copies of the directory rows they reference.
+        if db in settings.DATABASE_SHARDS:
+            return True
+        return None
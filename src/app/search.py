@@ -0,0 +1,152 @@
+# app/search.py
+import re
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from app.models import Product
+
+FTS_TABLE = "app_product_fts"
+
+# Column weights for bm25(): vendor tag, name, description. Installed as the table's
+# default rank, which is what its rank column returns.
+RANK = "bm25(0.0, 10.0, 1.0)"
+
+MAX_TERMS = 10
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _connection(using=None):
+    return connections[using or router.db_for_write(Product)]
+
+
+def uses_fts(using=None):
+    return _connection(using).vendor == "sqlite"
+
+
+def search_terms(query):
+    return TOKEN_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def create_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Creates the FTS5 index next to ``app_product`` and fills it if it is new.
+
+    Runs after every ``migrate``; other backends fall back to LIKE matching.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "vendor, name, description, "
+                "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5.
+            return
+
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', %s)", [RANK])
+
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        if not cursor.fetchone()[0]:
+            rebuild_search_index(using)
+
+
+def rebuild_search_index(using=DEFAULT_DB_ALIAS):
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, vendor, name, description) "
+            f"SELECT id, 'v' || vendor_id, name, description FROM {Product._meta.db_table}"
+        )
+
+
+def reindex_vendor(vendor_id, using=DEFAULT_DB_ALIAS):
+    """Rebuilds one vendor's index entries, e.g. after its products were copied in bulk."""
+    if not uses_fts(using):
+        return
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+            [f"vendor : v{vendor_id}"],
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, vendor, name, description) "
+            f"SELECT id, 'v' || vendor_id, name, description FROM {Product._meta.db_table} WHERE vendor_id = %s",
+            [vendor_id],
+        )
+
+
+def index_products(products, using=None):
+    if not uses_fts(using):
+        return
+
+    rows = [(p.pk, f"v{p.vendor_id}", p.name, p.description) for p in products]
+    if not rows:
+        return
+
+    with _connection(using).cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, vendor, name, description) VALUES (%s, %s, %s, %s)", rows
+        )
+
+
+def unindex_product(product_id, using=None):
+    if not uses_fts(using):
+        return
+
+    with _connection(using).cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def search_products(vendor, query, is_active=True, min_price=None, max_price=None,
+                    in_stock=False, limit=20, offset=0):
+    """
+    Returns the vendor's products matching every term of ``query`` (as prefixes),
+    best match first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    filters = Q(vendor=vendor)
+    if is_active is not None:
+        filters &= Q(is_active=is_active)
+    if min_price is not None:
+        filters &= Q(price__gte=min_price)
+    if max_price is not None:
+        filters &= Q(price__lte=max_price)
+    if in_stock:
+        filters &= Q(stock__gt=0)
+
+    queryset = Product.objects.filter(filters).select_related("vendor__user")
+
+    if not uses_fts():
+        for term in terms:
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return list(queryset.order_by("name")[offset:offset + limit])
+
+    prefixes = " ".join(f'"{term}"*' for term in terms)
+    match = f"vendor : v{vendor.pk} AND {{name description}} : ({prefixes})"
+    ranked = (
+        queryset
+        .filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]))
+        # LIMIT -1 keeps SQLite from flattening the matches into the per-row
+        # subquery: they are ranked once and looked up by rowid, instead of the
+        # full-text query running again for every product.
+        .annotate(rank=RawSQL(
+            f"SELECT rank FROM (SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT -1) "
+            f"WHERE rowid = {Product._meta.db_table}.id",
+            [match],
+        ))
+        .order_by("rank")
+    )
+    return list(ranked[offset:offset + limit])
@@ -1,32 +1,45 @@
 # app/serializers.py
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from app.models import Vendor, UserVendorRole, Product, Order, OrderItem
+from app.models import Vendor, UserVendorRole, Product, Order, OrderItem, VendorSalesRollup
 from accounts.serializers import UserSerializer
 from accounts.models import User
-
-class VendorSerializer(serializers.ModelSerializer):
+from app.catalog import bump_catalog_version
+from app.metrics import TimedListSerializer, TimedSerializerMixin
+from app.rollups import move_order, record_orders
+from app.notifications import notify_customers
+from app.stock import InsufficientStock, reserve_stock
+from app.tasks import enqueue
+
+class VendorSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = UserSerializer(source='user', read_only=True)
 
     class Meta:
         model = Vendor
+        list_serializer_class = TimedListSerializer
         fields = ["id", "store_name", "domain", "subdomain", "owner", "created_at"]
 
     def create(self, validated_data):
-        user = self.context["request"].user
-        vendor = Vendor.objects.create(user=user, **validated_data)
+        # Token users carry only an id.
+        user_id = self.context["request"].user.pk
+        vendor = Vendor.objects.create(user_id=user_id, **validated_data)
 
         UserVendorRole.objects.create(
-            user=user,
+            user_id=user_id,
             vendor=vendor,
             role=UserVendorRole.ROLE_OWNER
         )
         return vendor
 
-class UserVendorRoleSerializer(serializers.ModelSerializer):
+class UserVendorRoleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = UserVendorRole
+        list_serializer_class = TimedListSerializer
         fields = ["id", "user", "vendor", "role"]
 
     def create(self, validated_data):
@@ -40,11 +53,12 @@ class UserVendorRoleSerializer(serializers.ModelSerializer):
             defaults={"role": role}
         )[0]
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     vendor = VendorSerializer(read_only=True)
 
     class Meta:
         model = Product
+        list_serializer_class = TimedListSerializer
         fields = [
             "id", "vendor", "name", "description",
             "price", "stock", "is_active", "created_at"
@@ -52,21 +66,34 @@ class ProductSerializer(serializers.ModelSerializer):
 
     
 
+class ProductSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    in_stock = serializers.BooleanField(default=False)
+    is_active = serializers.ChoiceField(choices=["true", "false", "all"], default="true")
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+    offset = serializers.IntegerField(min_value=0, default=0)
+
 class OrderItemSerializer(serializers.ModelSerializer):
+    # Plain id on the way in; products are validated in one query by OrderSerializer.
+    product = serializers.IntegerField(source="product_id")
     product_name = serializers.ReadOnlyField(source="product.name")
 
     class Meta:
         model = OrderItem
         fields = ["id", "product", "product_name", "quantity", "price"]
         read_only_fields = ["price"]
+        extra_kwargs = {"quantity": {"min_value": 1}}
 
-class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True, read_only=True)
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, required=False)
     customer = UserSerializer(read_only=True)
     vendor = VendorSerializer(read_only=True)
 
     class Meta:
         model = Order
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "customer",
@@ -76,40 +103,131 @@ class OrderSerializer(serializers.ModelSerializer):
             "items",
             "created_at"
         ]
-        read_only_fields = ["total_amount", "items", "customer", "vendor"]
+        read_only_fields = ["total_amount", "customer", "vendor"]
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("An order needs at least one item.")
+
+        product_ids = {item["product_id"] for item in items}
+        # Batch callers (bulk ingestion) preload the vendor's active products for many orders at once.
+        products = self.context.get("products")
+        if products is None:
+            vendor = self.context["vendor"]
+            products = Product.objects.filter(vendor=vendor, is_active=True).in_bulk(product_ids)
+
+        missing = sorted(product_ids - products.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f"Products not available from this vendor: {missing}"
+            )
+
+        for item in items:
+            item["product"] = products[item.pop("product_id")]
+        return items
+
+    def validate(self, attrs):
+        if self.instance is None and not attrs.get("items"):
+            raise serializers.ValidationError({"items": "This field is required."})
+        return attrs
+
+    @staticmethod
+    def reserve_items(items_data):
+        quantities = Counter()
+        for item in items_data:
+            quantities[item["product"].pk] += item["quantity"]
+
+        try:
+            reserve_stock(quantities)
+        except InsufficientStock as exc:
+            raise serializers.ValidationError({"items": str(exc)})
+        # Stock is part of the published catalog.
+        bump_catalog_version(*{item["product"].vendor_id for item in items_data})
+
+    @staticmethod
+    def order_total(items_data):
+        return sum(item["quantity"] * item["product"].price for item in items_data)
+
+    @staticmethod
+    def order_units(items_data):
+        return sum(item["quantity"] for item in items_data)
+
+    @staticmethod
+    def build_items(order, items_data):
+        return [
+            OrderItem(
+                order=order,
+                product=item["product"],
+                quantity=item["quantity"],
+                price=item["product"].price,
+            )
+            for item in items_data
+        ]
 
     def create(self, validated_data):
         items_data = validated_data.pop("items")
-        user = self.context["request"].user
 
-        first_product = Product.objects.get(id=items_data[0]["product"].id)
-        vendor = first_product.vendor
+        with transaction.atomic(using=router.db_for_write(Order)):
+            self.reserve_items(items_data)
+            order = Order.objects.create(total_amount=self.order_total(items_data), **validated_data)
+            OrderItem.objects.bulk_create(self.build_items(order, items_data))
+            record_orders([(order, self.order_units(items_data))])
+            notify_customers([order])
 
-        order = Order.objects.create(
-            customer=user,
-            vendor=vendor,
-            total_amount=0
+        prefetch_related_objects(
+            [order], Prefetch("items", queryset=OrderItem.objects.select_related("product").order_by("id"))
         )
+        return order
 
-        total = 0
-        for item in items_data:
-            product = item["product"]
-            quantity = item["quantity"]
-            price = product.price
-
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                price=price
+    def update(self, instance, validated_data):
+        # Line items are fixed once the order is placed.
+        validated_data.pop("items", None)
+        old_status = instance.status
+        new_status = validated_data.get("status", old_status)
+
+        if old_status == Order.STATUS_CANCELLED and new_status != Order.STATUS_CANCELLED:
+            raise serializers.ValidationError({"status": "Cancelled orders cannot be reopened."})
+
+        if new_status == old_status:
+            return super().update(instance, validated_data)
+
+        using = router.db_for_write(Order, instance=instance)
+        with transaction.atomic(using=using):
+            # Only the request that actually flips the status moves stock and sales rollups.
+            changed = (
+                Order.objects
+                .filter(pk=instance.pk, status=old_status)
+                .update(status=new_status)
             )
+            if not changed:
+                raise serializers.ValidationError({"status": "The order was changed concurrently; reload it."})
 
-            total += quantity * price
+            quantities = Counter()
+            for item in instance.items.all():
+                quantities[item.product_id] += item.quantity
 
-        order.total_amount = total
-        order.save()
+            if new_status == Order.STATUS_CANCELLED:
+                enqueue("stock.release", using=using, vendor_id=instance.vendor_id, quantities=quantities)
+            move_order(instance, old_status, new_status, sum(quantities.values()))
+            notify_customers([instance])
 
-        return order
+            return super().update(instance, validated_data)
+
+class OrderIngestSerializer(OrderSerializer):
+    """One record of a bulk order feed; the customer is given by id."""
+
+    customer = serializers.IntegerField(source="customer_id")
+
+    def validate_customer(self, customer_id):
+        if customer_id not in self.context["customers"]:
+            raise serializers.ValidationError("Unknown customer.")
+        return customer_id
+
+class VendorSalesRollupSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = VendorSalesRollup
+        list_serializer_class = TimedListSerializer
+        fields = ["day", "status", "order_count", "revenue", "units"]
 
 class AssignRoleSerializer(serializers.Serializer):
     user_id = serializers.IntegerField()
@@ -0,0 +1,279 @@
+# app/shards.py
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.constants import OnConflict
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from accounts.models import User
+from app import caching
+from app.models import Vendor, VendorShard, Product, Order, OrderItem, VendorSalesRollup
+
+SHARD_MAP_VERSION_KEY = "shard-map-version"
+
+# Models whose rows belong to one vendor and live on its shard, in foreign key order.
+TENANT_MODELS = [Product, Order, OrderItem, VendorSalesRollup]
+TENANT_LABELS = {model._meta.label_lower for model in TENANT_MODELS}
+
+# Seconds clients are asked to wait when writing to a vendor that is being moved.
+MOVE_RETRY_AFTER = 5
+
+# With shards, each database gives new tenant rows ids from its own range: the
+# default one below SHARD_ID_SPAN, shardN from N * SHARD_ID_SPAN. Rows keep
+# their ids when a vendor moves, so they never collide with rows written on
+# the target.
+SHARD_ID_SPAN = 10 ** 12
+
+
+class VendorMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "This store is being moved to another database; try again shortly."
+    default_code = "vendor_moving"
+    wait = MOVE_RETRY_AFTER
+
+
+class Placement(NamedTuple):
+    alias: str
+    moving: bool = False
+
+
+DEFAULT_PLACEMENT = Placement(DEFAULT_DB_ALIAS)
+
+
+def shard_aliases():
+    """Every database that holds tenant data, the default one first."""
+    return [DEFAULT_DB_ALIAS, *settings.DATABASE_SHARDS]
+
+
+class ShardMap:
+    """
+    In-process copy of the ``VendorShard`` table.
+
+    Reloaded whenever any process bumps the shared version key (see
+    ``invalidate``), so a lookup normally costs a single cache read. Without a
+    shared default cache it is also reloaded after ``caching.LOCAL_MAP_MAX_AGE``
+    seconds. The table is always read from the primary.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0.0
+        self._placements = {}
+
+    def _shared_version(self):
+        version = cache.get(SHARD_MAP_VERSION_KEY)
+        if version is None:
+            cache.add(SHARD_MAP_VERSION_KEY, time.time_ns(), None)
+            version = cache.get(SHARD_MAP_VERSION_KEY)
+        return version
+
+    def _is_current(self, version):
+        if version != self._version:
+            return False
+        return caching.cache_is_shared() or time.monotonic() - self._loaded_at < caching.LOCAL_MAP_MAX_AGE
+
+    def _load(self):
+        version = self._shared_version()
+        if self._is_current(version):
+            return
+
+        with self._lock:
+            if self._is_current(version):
+                return
+
+            self._placements = {
+                vendor_id: Placement(alias, moving)
+                for vendor_id, alias, moving in
+                VendorShard.objects.using(DEFAULT_DB_ALIAS).values_list("vendor_id", "alias", "moving")
+            }
+            self._version = version
+            self._loaded_at = time.monotonic()
+
+    def get(self, vendor_id):
+        self._load()
+        placement = self._placements.get(int(vendor_id), DEFAULT_PLACEMENT)
+        if placement.alias not in settings.DATABASES:
+            raise ImproperlyConfigured(f"Vendor {vendor_id} is on {placement.alias!r}, which is not configured.")
+        return placement
+
+    def invalidate(self):
+        self._version = None
+        cache.set(SHARD_MAP_VERSION_KEY, time.time_ns(), None)
+
+
+shard_map = ShardMap()
+
+
+def vendor_db(vendor_id):
+    return shard_map.get(vendor_id).alias
+
+
+class Tenant(NamedTuple):
+    vendor_id: int
+    placement: Placement
+
+
+_tenant = ContextVar("tenant", default=None)
+
+
+def current_tenant():
+    return _tenant.get()
+
+
+def set_tenant(vendor):
+    """
+    Routes tenant models to ``vendor``'s shard for the rest of the current context.
+
+    ``TenantMiddleware`` sets it for every request and it is cleared on
+    ``request_finished``, once streamed responses have been read to the end.
+    """
+    _tenant.set(None if vendor is None else Tenant(vendor.pk, shard_map.get(vendor.pk)))
+
+
+@contextmanager
+def using_vendor(vendor_id):
+    """Routes tenant models to the vendor's shard inside the block, for code outside requests."""
+    token = _tenant.set(Tenant(int(vendor_id), shard_map.get(vendor_id)))
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def vendor_of(instance):
+    if isinstance(instance, Vendor):
+        return instance.pk
+    return getattr(instance, "vendor_id", None)
+
+
+def id_range(alias):
+    """``(low, high]``: the tenant row ids ``alias`` allocates."""
+    low = shard_aliases().index(alias) * SHARD_ID_SPAN
+    return low, low + SHARD_ID_SPAN
+
+
+def allocate_ids(using, model, count):
+    """
+    Takes ``count`` new ids for ``model`` rows on ``using`` from its ``id_range``, or ``None`` without shards.
+
+    The table's AUTOINCREMENT sequence is the counter, but rows get these ids
+    explicitly: SQLite itself allocates past the highest id in the table, and
+    after a move that id can be in another database's range.
+    """
+    connection = connections[using]
+    if not settings.DATABASE_SHARDS or connection.vendor != "sqlite" or using not in shard_aliases():
+        return None
+    low, _ = id_range(using)
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, %s) + %s WHERE name = %s RETURNING seq",
+            [low, count, table],
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s) RETURNING seq", [table, low + count]
+            )
+            row = cursor.fetchone()
+    return range(row[0] - count + 1, row[0] + 1)
+
+
+@contextmanager
+def kept_id_sequences(using, models=TENANT_MODELS):
+    """
+    Puts the AUTOINCREMENT sequences of ``models`` on ``using`` back where they were after the block.
+
+    SQLite advances a sequence past any id inserted explicitly; rows copied in
+    from another database's range must not move this one's. Use inside a
+    transaction: the sequences stay locked until it commits.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        # A no-op write, so no allocation can slip in before the restore.
+        cursor.execute(
+            "UPDATE sqlite_sequence SET seq = seq WHERE name IN (%s) RETURNING name, seq"
+            % ", ".join(["%s"] * len(tables)),
+            tables,
+        )
+        before = dict(cursor.fetchall())
+    yield
+    low, _ = id_range(using)
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [before.get(table, low), table])
+
+
+def upsert_rows(alias, model, objs):
+    """
+    Writes ``objs`` to ``alias`` as they are, replacing rows with the same primary key.
+
+    A raw insert, like fixture loading: ``bulk_create`` would restamp
+    ``auto_now_add`` fields such as ``created_at``.
+    """
+    if not objs:
+        return
+    fields = model._meta.concrete_fields
+    rows = model._base_manager.using(alias)
+    batch_size = max(connections[alias].ops.bulk_batch_size(fields, objs), 1)
+    for start in range(0, len(objs), batch_size):
+        rows._insert(
+            objs[start:start + batch_size],
+            fields=fields,
+            raw=True,
+            using=alias,
+            on_conflict=OnConflict.UPDATE,
+            update_fields=[field for field in fields if not field.primary_key],
+            unique_fields=[model._meta.pk],
+        )
+
+
+def copy_directory_rows(alias, vendor_ids=(), user_ids=()):
+    """
+    Upserts vendors, their owners and other users from the default database into shard ``alias``.
+
+    Tenant rows keep real foreign keys to ``Vendor`` and ``User``, so each shard
+    holds copies of the ones it references; joins such as ``select_related("customer")``
+    then work unchanged. Copies carry no usable password. A no-op for the default
+    database, which is the directory.
+    """
+    if alias not in settings.DATABASE_SHARDS:
+        return
+    vendors = list(Vendor.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=vendor_ids))
+    users = list(User.objects.using(DEFAULT_DB_ALIAS).filter(pk__in={*user_ids, *(v.user_id for v in vendors)}))
+    for user in users:
+        user.password = UNUSABLE_PASSWORD_PREFIX
+    upsert_rows(alias, User, users)
+    upsert_rows(alias, Vendor, vendors)
+
+
+def refresh_user_copies(user):
+    """Brings the shards' copies of ``user`` up to date; shards without one are left alone."""
+    values = {
+        field.attname: getattr(user, field.attname)
+        for field in User._meta.concrete_fields
+        if not field.primary_key and field.name != "password"
+    }
+    for alias in settings.DATABASE_SHARDS:
+        User._base_manager.using(alias).filter(pk=user.pk).update(**values)
+
+
+def tenant_rows(model, vendor_id, using):
+    rows = model._base_manager.using(using)
+    if model is OrderItem:
+        return rows.filter(order__vendor_id=vendor_id)
+    return rows.filter(vendor_id=vendor_id)
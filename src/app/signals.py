@@ -0,0 +1,93 @@
+# app/signals.py
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from app.catalog import bump_catalog_version
+from app.models import UserVendorRole, Vendor, VendorShard, Product, Order
+from app.roles import invalidate_user_role
+from app.search import index_products, unindex_product
+from app.shards import copy_directory_rows, refresh_user_copies, set_tenant, shard_map, vendor_db
+from app.tenants import tenant_map
+from app.tokens import bump_role_version
+
+
+@receiver([post_save, post_delete], sender=UserVendorRole)
+def vendor_role_changed(sender, instance, **kwargs):
+    invalidate_user_role(instance.user_id, instance.vendor_id)
+    bump_role_version(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Vendor)
+def vendor_changed(sender, instance, **kwargs):
+    tenant_map.invalidate()
+    bump_catalog_version(instance.pk)
+
+
+@receiver(post_save, sender=Vendor)
+def vendor_saved(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        copy_directory_rows(vendor_db(instance.pk), vendor_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Vendor)
+def vendor_deleting(sender, instance, using, **kwargs):
+    # Deleting from the directory cascades on the default database only.
+    alias = vendor_db(instance.pk) if using == DEFAULT_DB_ALIAS else DEFAULT_DB_ALIAS
+    if alias != DEFAULT_DB_ALIAS:
+        Vendor.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+@receiver([post_save, post_delete], sender=VendorShard)
+def vendor_shard_changed(sender, **kwargs):
+    shard_map.invalidate()
+
+
+@receiver(request_finished)
+def request_done(sender, **kwargs):
+    # Sent once the response, streamed ones included, has been sent.
+    set_tenant(None)
+
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, using, raw, **kwargs):
+    # Orders on a shard point at a copy of their customer.
+    if instance._state.adding and not raw:
+        copy_directory_rows(using, user_ids=[instance.customer_id])
+
+
+# Product responses embed the vendor owner.
+OWNER_FIELDS = {"email", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, using, **kwargs):
+    if created or using != DEFAULT_DB_ALIAS:
+        return
+    refresh_user_copies(instance)
+    # Tokens issued before the change stop being trusted on their claims alone.
+    bump_role_version(instance.pk)
+    if update_fields is None or OWNER_FIELDS & set(update_fields):
+        bump_catalog_version(*Vendor.objects.filter(user=instance).values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        for alias in settings.DATABASE_SHARDS:
+            User.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, using, **kwargs):
+    index_products([instance], using=using)
+    bump_catalog_version(instance.vendor_id)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, using, **kwargs):
+    unindex_product(instance.pk, using=using)
+    bump_catalog_version(instance.vendor_id)
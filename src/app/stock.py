@@ -0,0 +1,80 @@
+# app/stock.py
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from app.catalog import bump_catalog_version
+from app.models import Product
+from app.shards import using_vendor
+from app.tasks import task
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Insufficient stock for products: {product_ids}")
+
+
+class _ShortStock(Exception):
+    pass
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reserve_stock(quantities):
+    """
+    Take ``{product_id: quantity}`` out of stock, all or nothing.
+
+    A single conditional UPDATE decrements every row that still has enough stock;
+    if any row was short the savepoint is rolled back and ``InsufficientStock`` is
+    raised, so a checkout that loses a race fails instead of waiting on a lock.
+    """
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+
+    needed = _per_product(quantities)
+    using = router.db_for_write(Product)
+    try:
+        with transaction.atomic(using=using):
+            if connections[using].features.has_select_for_update:
+                # Lock rows in primary key order so concurrent multi-item checkouts cannot deadlock.
+                list(
+                    Product.objects.select_for_update()
+                    .filter(pk__in=quantities)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)
+                )
+
+            updated = (
+                Product.objects
+                .filter(pk__in=quantities, stock__gte=needed)
+                .update(stock=F("stock") - needed)
+            )
+            if updated != len(quantities):
+                raise _ShortStock
+    except _ShortStock:
+        short = Product.objects.filter(pk__in=quantities, stock__lt=needed).values_list("pk", flat=True)
+        raise InsufficientStock(sorted(short))
+
+
+def release_stock(quantities):
+    """Put ``{product_id: quantity}`` back into stock, e.g. when an order is cancelled."""
+    quantities = {pk: quantity for pk, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+
+    Product.objects.filter(pk__in=quantities).update(stock=F("stock") + _per_product(quantities))
+
+
+@task("stock.release")
+def release_stock_task(vendor_id, quantities):
+    """Task form of ``release_stock``; JSON turns the product ids into strings."""
+    with using_vendor(vendor_id):
+        release_stock({int(pk): quantity for pk, quantity in quantities.items()})
+    # Stock is part of the published catalog.
+    bump_catalog_version(vendor_id)
@@ -0,0 +1,123 @@
+# app/tasks.py
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.models import Task
+
+logger = logging.getLogger("app.tasks")
+
+TASK_LEASE_SECONDS = 60
+RETRY_BASE_SECONDS = 2
+RETRY_MAX_SECONDS = 15 * 60
+
+_handlers = {}
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def task(name):
+    """Registers the decorated function as the handler of tasks called ``name``."""
+    def register(func):
+        _handlers[name] = func
+        return func
+    return register
+
+
+def enqueue(name, using=DEFAULT_DB_ALIAS, delay=0, **payload):
+    """
+    Queues ``name(**payload)``; ``payload`` must be JSON-serializable.
+
+    The row is written in the caller's transaction on ``using``, so the task
+    exists exactly when the change that asked for it commits.
+    """
+    return Task.objects.using(using).create(
+        name=name, payload=payload, run_at=timezone.now() + timedelta(seconds=delay)
+    )
+
+
+def backoff(attempts):
+    """Exponential delay before the next attempt, with jitter so retries do not arrive in step."""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(using, limit, lease=TASK_LEASE_SECONDS):
+    """
+    Leases up to ``limit`` due tasks on ``using``: pending ones whose time has
+    come and running ones whose lease expired (their worker died).
+
+    A conditional UPDATE takes them, so concurrent workers never share a lease.
+    """
+    now = timezone.now()
+    due = Q(status=Task.STATUS_PENDING, run_at__lte=now) | Q(status=Task.STATUS_RUNNING, locked_until__lt=now)
+    tasks = Task.objects.using(using)
+    ids = list(tasks.filter(due).order_by("run_at").values_list("pk", flat=True)[:limit])
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    tasks.filter(due, pk__in=ids).update(
+        status=Task.STATUS_RUNNING,
+        locked_by=token,
+        locked_until=now + timedelta(seconds=lease),
+        attempts=F("attempts") + 1,
+    )
+    return list(tasks.filter(pk__in=ids, locked_by=token, status=Task.STATUS_RUNNING).order_by("run_at"))
+
+
+def run(claimed, using):
+    """
+    Runs one leased task and deletes it on success.
+
+    The handler's writes on ``using`` commit together with the deletion, so they
+    happen once; anything else it does (mail, writes to other databases) may be
+    repeated after a crash or retry, and handlers must tolerate that. Returns
+    whether the task succeeded.
+    """
+    tasks = Task.objects.using(using).filter(pk=claimed.pk, locked_by=claimed.locked_by)
+    handler = _handlers.get(claimed.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task {claimed.name!r}.")
+        with transaction.atomic(using=using):
+            handler(**claimed.payload)
+            if not tasks.delete()[0]:
+                raise LeaseLost
+    except LeaseLost:
+        logger.warning("Lease on task %s (%s) expired while it ran; its writes were rolled back.", claimed.pk, claimed.name)
+        return False
+    except Exception:
+        failed = handler is None or claimed.attempts >= claimed.max_attempts
+        tasks.update(
+            status=Task.STATUS_FAILED if failed else Task.STATUS_PENDING,
+            run_at=timezone.now() + timedelta(seconds=backoff(claimed.attempts)),
+            locked_by="",
+            locked_until=None,
+            last_error=traceback.format_exc()[-4000:],
+        )
+        logger.exception(
+            "Task %s (%s) failed on attempt %d%s.", claimed.pk, claimed.name, claimed.attempts,
+            "; giving up" if failed else "",
+        )
+        return False
+    return True
+
+
+def run_due_tasks(databases=(DEFAULT_DB_ALIAS,), limit=100):
+    """Runs due tasks inline until none are left; for tests and one-off drains. Returns how many ran."""
+    ran = 0
+    for using in databases:
+        while claimed := claim(using, limit):
+            for item in claimed:
+                run(item, using)
+            ran += len(claimed)
+    return ran
@@ -0,0 +1,95 @@
+# app/tenants.py
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from app import caching
+from app.models import Vendor
+
+TENANT_MAP_VERSION_KEY = "tenant-map-version"
+
+
+class TenantMap:
+    """
+    In-process index of vendors by id and by host.
+
+    The whole Vendor table is loaded once and kept until any process bumps the
+    shared version key (see ``invalidate``), so resolving a tenant normally
+    costs a single cache read and no queries. When the default cache is not
+    shared between workers, the map is also reloaded after
+    ``caching.LOCAL_MAP_MAX_AGE`` seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0.0
+        self._by_id = {}
+        self._by_domain = {}
+        self._by_subdomain = {}
+
+    def _shared_version(self):
+        version = cache.get(TENANT_MAP_VERSION_KEY)
+        if version is None:
+            cache.add(TENANT_MAP_VERSION_KEY, time.time_ns(), None)
+            version = cache.get(TENANT_MAP_VERSION_KEY)
+        return version
+
+    def _is_current(self, version):
+        if version != self._version:
+            return False
+        return caching.cache_is_shared() or time.monotonic() - self._loaded_at < caching.LOCAL_MAP_MAX_AGE
+
+    def _load(self):
+        version = self._shared_version()
+        if self._is_current(version):
+            return
+
+        with self._lock:
+            if self._is_current(version):
+                return
+
+            by_id, by_domain, by_subdomain = {}, {}, {}
+            for vendor in Vendor.objects.all():
+                by_id[vendor.pk] = vendor
+                if vendor.subdomain:
+                    by_subdomain.setdefault(vendor.subdomain.lower(), vendor.pk)
+                if vendor.domain:
+                    by_domain[vendor.domain.lower()] = vendor.pk
+
+            self._by_id, self._by_domain, self._by_subdomain = by_id, by_domain, by_subdomain
+            self._version = version
+            self._loaded_at = time.monotonic()
+
+    def get(self, vendor_id):
+        self._load()
+        vendor = self._by_id.get(int(vendor_id))
+        # Hand out copies so per-request relation caches never leak between requests.
+        return copy.copy(vendor) if vendor is not None else None
+
+    def get_by_host(self, host):
+        """
+        The vendor whose ``domain`` is ``host``, or whose ``subdomain`` it is under
+        one of ``TENANT_BASE_DOMAINS``; ``None`` for any other host.
+        """
+        if not host:
+            return None
+
+        self._load()
+        host = host.lower()
+        vendor_id = self._by_domain.get(host)
+        if vendor_id is None and "." in host:
+            subdomain, base = host.split(".", 1)
+            if base in settings.TENANT_BASE_DOMAINS:
+                vendor_id = self._by_subdomain.get(subdomain)
+        return self.get(vendor_id) if vendor_id is not None else None
+
+    def invalidate(self):
+        self._version = None
+        cache.set(TENANT_MAP_VERSION_KEY, time.time_ns(), None)
+
+
+tenant_map = TenantMap()
@@ -1,3 +1,1501 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.db import connection, router
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts.models import User
+from app import caching
+from app.catalog import bump_catalog_version, catalog_cache, get_or_build
+from app.exports import ORDER_EXPORT_FIELDS
+from app.admin import EstimatedCountPaginator, estimated_rows
+from app.idempotency import result_key
+from app.metrics import registry
+from app.middleware import ReplicaReadMiddleware, TenantMiddleware
+from app.models import Vendor, VendorShard, UserVendorRole, Product, Order, OrderItem, VendorSalesRollup, Task
+from app.roles import NO_ROLE, get_user_role, invalidate_user_role, role_cache_key
+from app.rollups import rebuild_rollups
+from app.shards import SHARD_ID_SPAN, shard_aliases, shard_map, using_vendor
+from app.tasks import claim, enqueue, run, run_due_tasks, task
+from app.tenants import tenant_map
+from app.throttling import parse_rate, take
+from app.tokens import ROLES_CLAIM, role_version, role_version_key
+
+
+class TenantTestCase(TestCase):
+    """Owner, staff and customer of a single vendor with a small catalog."""
+
+    # User changes are copied to every configured shard.
+    databases = {"default", *settings.DATABASE_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner@example.com", "pass1234")
+        cls.staff = User.objects.create_user("staff@example.com", "pass1234")
+        cls.customer = User.objects.create_user("customer@example.com", "pass1234")
+
+        cls.vendor = Vendor.objects.create(user=cls.owner, store_name="Acme")
+        UserVendorRole.objects.create(user=cls.owner, vendor=cls.vendor, role=UserVendorRole.ROLE_OWNER)
+        UserVendorRole.objects.create(user=cls.staff, vendor=cls.vendor, role=UserVendorRole.ROLE_STAFF)
+        UserVendorRole.objects.create(user=cls.customer, vendor=cls.vendor, role=UserVendorRole.ROLE_CUSTOMER)
+
+        cls.products = [
+            Product.objects.create(vendor=cls.vendor, name=f"Product {i}", price=Decimal("10.00"), stock=100)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        caches["catalog"].clear()
+        caches["idempotency"].clear()
+        caches["throttle"].clear()
+        self.client = APIClient()
+
+    def login(self, user):
+        self.client.force_authenticate(user)
+
+    def create_orders(self, count, customer=None):
+        for _ in range(count):
+            order = Order.objects.create(
+                customer=customer or self.customer,
+                vendor=self.vendor,
+                total_amount=Decimal("30.00"),
+            )
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=1, price=product.price)
+                for product in self.products
+            )
+
+
+class OrderQueryCountTests(TenantTestCase):
+    # One query for the order page (customer and vendor owner joined in) and one
+    # for the prefetched line items with their products.
+    LIST_QUERIES = 2
+
+    def setUp(self):
+        super().setUp()
+        self.list_url = f"/app/vendors/{self.vendor.id}/orders/"
+
+    def warm(self, url):
+        # Fills the tenant map and role cache so only serialization queries are counted.
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_order_list_query_count_is_constant(self):
+        self.login(self.owner)
+        self.create_orders(1)
+        self.warm(self.list_url)
+
+        with self.assertNumQueries(self.LIST_QUERIES):
+            self.client.get(self.list_url)
+
+        self.create_orders(25)
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(len(response.json()["results"]), 26)
+
+    def test_customer_order_list_query_count_is_constant(self):
+        other = User.objects.create_user("other@example.com", "pass1234")
+        self.create_orders(10)
+        self.create_orders(10, customer=other)
+        self.login(self.customer)
+        self.warm(self.list_url)
+
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(self.list_url)
+
+        self.assertEqual(len(response.json()["results"]), 10)
+
+    def test_order_detail_query_count(self):
+        self.create_orders(1)
+        order = Order.objects.get()
+        url = f"/app/vendors/{self.vendor.id}/orders/{order.id}/"
+        self.login(self.owner)
+        self.warm(url)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(
+            sorted(item["product_name"] for item in response.json()["items"]),
+            ["Product 0", "Product 1", "Product 2"],
+        )
+
+
+@override_settings(ALLOWED_HOSTS=["*"], TENANT_BASE_DOMAINS=["shop.example.com"])
+class TenantResolutionTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        Vendor.objects.filter(pk=self.vendor.pk).update(domain="acme-store.com", subdomain="acme")
+        tenant_map.invalidate()
+
+    def resolve(self, host, **view_kwargs):
+        return TenantMiddleware(lambda request: None).resolve(RequestFactory().get("/", HTTP_HOST=host), view_kwargs)
+
+    def test_vendor_from_url_or_host(self):
+        self.assertEqual(self.resolve("acme-store.com").pk, self.vendor.pk)
+        self.assertEqual(self.resolve("ACME.shop.example.com:8000").pk, self.vendor.pk)
+
+        other = Vendor.objects.create(user=self.owner, store_name="Other")
+        self.assertEqual(self.resolve("acme-store.com", vendor_id=str(other.pk)).pk, other.pk)
+
+        with self.assertNumQueries(0):
+            self.resolve("acme.shop.example.com")
+
+    def test_unknown_hosts_have_no_vendor(self):
+        for host in ["acme.evil.example", "acme", "other.shop.example.com", "shop.example.com", "evil.acme-store.com"]:
+            with self.subTest(host=host):
+                self.assertIsNone(self.resolve(host))
+        self.assertIsNone(self.resolve("bad host"))
+        self.assertIsNone(self.resolve("acme-store.com", vendor_id="999999"))
+
+    def test_map_follows_vendor_create_and_rename(self):
+        self.resolve("acme-store.com")
+
+        new = Vendor.objects.create(user=self.owner, store_name="New", subdomain="new")
+        self.assertEqual(self.resolve("new.shop.example.com").pk, new.pk)
+
+        self.vendor.subdomain = "renamed"
+        self.vendor.save()
+        self.assertIsNone(self.resolve("acme.shop.example.com"))
+        self.assertEqual(self.resolve("renamed.shop.example.com").store_name, "Acme")
+
+        new.delete()
+        self.assertIsNone(self.resolve("new.shop.example.com"))
+
+    def test_map_expires_when_the_cache_is_not_shared(self):
+        self.resolve("acme-store.com")
+        # Renamed by another worker, whose invalidation this one cannot see.
+        Vendor.objects.filter(pk=self.vendor.pk).update(domain="acme.org")
+
+        with override_settings(SINGLE_WORKER_PROCESS=False):
+            self.assertEqual(self.resolve("acme-store.com").pk, self.vendor.pk)
+            with mock.patch("app.caching.LOCAL_MAP_MAX_AGE", 0):
+                self.assertIsNone(self.resolve("acme-store.com"))
+                self.assertEqual(self.resolve("acme.org").pk, self.vendor.pk)
+
+
+class RoleCacheTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.orders_url = f"/app/vendors/{self.vendor.id}/orders/"
+        self.create_orders(3)
+
+    def visible_orders(self):
+        return len(self.client.get(self.orders_url).json()["results"])
+
+    def test_role_change_and_delete_show_on_the_next_request(self):
+        self.login(self.staff)
+        self.assertEqual(self.visible_orders(), 3)
+
+        membership = UserVendorRole.objects.get(user=self.staff, vendor=self.vendor)
+        membership.role = UserVendorRole.ROLE_CUSTOMER
+        membership.save()
+        self.assertEqual(self.visible_orders(), 0)
+
+        membership.role = UserVendorRole.ROLE_STAFF
+        membership.save()
+        self.assertEqual(self.visible_orders(), 3)
+
+        membership.delete()
+        self.assertEqual(self.visible_orders(), 0)
+
+    def test_missing_role_is_cached_until_one_is_granted(self):
+        outsider = User.objects.create_user("outsider@example.com", "pass1234")
+        key = role_cache_key(outsider.pk, self.vendor.pk)
+
+        self.assertIsNone(get_user_role(outsider, self.vendor))
+        self.assertEqual(cache.get(key), NO_ROLE)
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_user_role(outsider, self.vendor))
+
+        UserVendorRole.objects.create(user=outsider, vendor=self.vendor, role=UserVendorRole.ROLE_STAFF)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(get_user_role(outsider, self.vendor), UserVendorRole.ROLE_STAFF)
+
+    def test_writes_outside_the_role_are_forbidden(self):
+        base = f"/app/vendors/{self.vendor.id}"
+        self.login(self.customer)
+        response = self.client.post(f"{base}/products/", {"name": "New", "price": "1.00"}, format="json")
+        self.assertEqual(response.status_code, 403)
+        order = Order.objects.first()
+        response = self.client.patch(f"{self.orders_url}{order.pk}/", {"status": "paid"}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+        self.login(self.staff)
+        self.assertEqual(self.client.delete(f"{base}/products/{self.products[0].pk}/").status_code, 403)
+        response = self.client.post(
+            self.orders_url, {"items": [{"product": self.products[0].pk, "quantity": 1}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(SINGLE_WORKER_PROCESS=False)
+    def test_roles_are_not_cached_when_the_cache_is_not_shared(self):
+        self.assertEqual(get_user_role(self.staff, self.vendor), UserVendorRole.ROLE_STAFF)
+        self.assertIsNone(cache.get(role_cache_key(self.staff.pk, self.vendor.pk)))
+
+        # Changed by another worker, whose invalidation this one would not see.
+        UserVendorRole.objects.filter(user=self.staff).update(role=UserVendorRole.ROLE_CUSTOMER)
+        self.assertEqual(get_user_role(self.staff, self.vendor), UserVendorRole.ROLE_CUSTOMER)
+
+
+class TokenClaimsTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.orders_url = f"/app/vendors/{self.vendor.id}/orders/"
+
+    def obtain(self, user):
+        response = self.client.post(
+            "/accounts/login/", {"email": user.email, "password": "pass1234"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def use(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_current_token_needs_no_user_or_role_query(self):
+        self.create_orders(2)
+        self.use(self.obtain(self.owner)["access"])
+        self.client.get(self.orders_url)
+
+        # Orders and their line items only.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.orders_url)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+    def test_role_changes_override_stale_claims(self):
+        tokens = self.obtain(self.staff)
+        self.use(tokens["access"])
+        self.assertEqual(self.client.get(f"{self.orders_url}").status_code, 200)
+        self.create_orders(1)
+        self.assertEqual(len(self.client.get(self.orders_url).json()["results"]), 1)
+
+        UserVendorRole.objects.filter(user=self.staff).update(role=UserVendorRole.ROLE_CUSTOMER)
+        role = UserVendorRole.objects.get(user=self.staff)
+        role.save()
+
+        # The old token now goes through the database: the staff member sees only their own orders.
+        self.assertEqual(self.client.get(self.orders_url).json()["results"], [])
+
+        access = self.client.post("/accounts/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.use(access.json()["access"])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.orders_url).json()["results"], [])
+
+    def test_refresh_past_the_claim_limit_drops_login_roles(self):
+        tokens = self.obtain(self.staff)
+        other = Vendor.objects.create(user=self.owner, store_name="Other")
+        UserVendorRole.objects.create(user=self.staff, vendor=other, role=UserVendorRole.ROLE_STAFF)
+
+        with mock.patch("app.tokens.MAX_ROLE_CLAIMS", 1):
+            access = self.client.post("/accounts/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        token = AccessToken(access.json()["access"])
+
+        self.assertNotIn(ROLES_CLAIM, token)
+        # Changed without a signal, so the token's role version stays current.
+        self.create_orders(1)
+        UserVendorRole.objects.filter(user=self.staff, vendor=self.vendor).update(role=UserVendorRole.ROLE_CUSTOMER)
+        self.use(str(token))
+        self.assertEqual(self.client.get(self.orders_url).json()["results"], [])
+
+    def test_claims_are_not_trusted_when_workers_keep_their_own_cache(self):
+        self.create_orders(1)
+        self.use(self.obtain(self.staff)["access"])
+        version = role_version(self.staff.pk)
+
+        # Revoked on another worker: this process's cache still has the old version.
+        UserVendorRole.objects.filter(user=self.staff).update(role=UserVendorRole.ROLE_CUSTOMER)
+        cache.clear()
+        cache.set(role_version_key(self.staff.pk), version, None)
+
+        with self.settings(SINGLE_WORKER_PROCESS=True):
+            self.assertEqual(len(self.client.get(self.orders_url).json()["results"]), 1)
+        with self.settings(SINGLE_WORKER_PROCESS=False):
+            self.assertEqual(self.client.get(self.orders_url).json()["results"], [])
+
+    def test_deactivated_users_are_rejected(self):
+        self.use(self.obtain(self.customer)["access"])
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.client.get(self.orders_url).status_code, 401)
+
+
+class CursorPaginationTests(TenantTestCase):
+    def test_pages_walk_forward_and_back_without_gaps(self):
+        self.create_orders(7)
+        self.login(self.owner)
+        expected = list(Order.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+        seen, pages = [], []
+        url = f"/app/vendors/{self.vendor.id}/orders/?page_size=3"
+        while url:
+            page = self.client.get(url).json()
+            pages.append(page)
+            seen.extend(order["id"] for order in page["results"])
+            url = page["next"]
+
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page["results"]) for page in pages], [3, 3, 1])
+        self.assertIsNone(pages[0]["previous"])
+
+        previous = self.client.get(pages[2]["previous"]).json()
+        self.assertEqual(previous["results"], pages[1]["results"])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.login(self.owner)
+        response = self.client.get(f"/app/vendors/{self.vendor.id}/orders/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderCreateTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f"/app/vendors/{self.vendor.id}/orders/"
+        self.login(self.customer)
+
+    def place(self, items):
+        return self.client.post(self.url, {"items": items}, format="json")
+
+    def test_order_is_created_with_items_and_total(self):
+        response = self.place([
+            {"product": self.products[0].id, "quantity": 2},
+            {"product": self.products[1].id, "quantity": 1},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["total_amount"], "30.00")
+        self.assertEqual(len(response.json()["items"]), 2)
+        self.assertEqual(OrderItem.objects.filter(order_id=response.json()["id"]).count(), 2)
+
+    # Products, stock reservation (inside a savepoint), order insert, bulk item insert,
+    # the queued rollup and mail tasks, and the customer and item prefetch for the
+    # response (token users carry only an id), plus transaction bookkeeping. With
+    # shards, the order and item ids are allocated first.
+    CREATE_QUERIES = 15 if settings.DATABASE_SHARDS else 13
+
+    def test_query_count_does_not_grow_with_line_items(self):
+        self.place([{"product": self.products[0].id, "quantity": 1}])
+
+        with self.assertNumQueries(self.CREATE_QUERIES):
+            self.place([{"product": self.products[0].id, "quantity": 1}])
+
+        many = [{"product": product.id, "quantity": 1} for product in self.products] * 50
+        with self.assertNumQueries(self.CREATE_QUERIES):
+            response = self.place(many)
+
+        self.assertEqual(len(response.json()["items"]), 150)
+
+    def test_products_from_another_vendor_are_rejected(self):
+        other_vendor = Vendor.objects.create(user=self.owner, store_name="Other")
+        foreign = Product.objects.create(vendor=other_vendor, name="Foreign", price=Decimal("1.00"))
+
+        response = self.place([
+            {"product": self.products[0].id, "quantity": 1},
+            {"product": foreign.id, "quantity": 1},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_order_without_items_is_rejected(self):
+        self.assertEqual(self.place([]).status_code, 400)
+
+
+class StockReservationTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.products[0]
+        Product.objects.filter(pk=self.product.pk).update(stock=3)
+        self.url = f"/app/vendors/{self.vendor.id}/orders/"
+
+    def place(self, quantity):
+        self.login(self.customer)
+        return self.client.post(
+            self.url, {"items": [{"product": self.product.id, "quantity": quantity}]}, format="json"
+        )
+
+    def stock(self):
+        return Product.objects.values_list("stock", flat=True).get(pk=self.product.pk)
+
+    def test_placing_an_order_reserves_stock(self):
+        self.assertEqual(self.place(2).status_code, 201)
+        self.assertEqual(self.stock(), 1)
+
+    def test_order_beyond_stock_is_rejected_without_side_effects(self):
+        self.assertEqual(self.place(2).status_code, 201)
+
+        response = self.place(2)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stock(), 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_cancelling_releases_stock_once(self):
+        order_id = self.place(3).json()["id"]
+        self.assertEqual(self.stock(), 0)
+        self.login(self.staff)
+        url = f"{self.url}{order_id}/"
+
+        self.assertEqual(self.client.patch(url, {"status": Order.STATUS_CANCELLED}, format="json").status_code, 200)
+        self.assertEqual(self.client.patch(url, {"status": Order.STATUS_CANCELLED}, format="json").status_code, 200)
+        self.assertEqual(self.stock(), 0)
+
+        run_due_tasks(shard_aliases())
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(self.client.patch(url, {"status": Order.STATUS_PAID}, format="json").status_code, 400)
+
+
+class OrderBulkIngestTests(TenantTestCase):
+    def ingest(self, lines):
+        self.login(self.owner)
+        response = self.client.generic(
+            "POST",
+            f"/app/vendors/{self.vendor.id}/orders/bulk/",
+            "\n".join(lines).encode(),
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_feed_is_written_with_per_record_results(self):
+        good = json.dumps({"customer": self.customer.id, "items": [{"product": self.products[0].id, "quantity": 2}]})
+        results = self.ingest([
+            good,
+            "",
+            "{not json",
+            json.dumps({"customer": self.customer.id, "items": [{"product": 999999, "quantity": 1}]}),
+            json.dumps({"customer": 999999, "items": [{"product": self.products[1].id, "quantity": 1}]}),
+            good,
+        ])
+
+        self.assertEqual([r.get("status") for r in results[:-1]], ["created", "error", "error", "error", "created"])
+        self.assertEqual([r["line"] for r in results[:-1]], [1, 3, 4, 5, 6])
+        self.assertEqual(results[-1], {"created": 2, "failed": 3})
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 96)
+        self.assertEqual(Order.objects.get(pk=results[0]["id"]).items.get().quantity, 2)
+
+    def test_customers_cannot_ingest(self):
+        self.login(self.customer)
+        response = self.client.post(
+            f"/app/vendors/{self.vendor.id}/orders/bulk/", b"{}", content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class IdempotencyKeyTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f"/app/vendors/{self.vendor.id}/orders/"
+        self.body = {"items": [{"product": self.products[0].id, "quantity": 2}]}
+
+    def place(self, key, user=None):
+        self.login(user or self.customer)
+        return self.client.post(self.url, self.body, format="json", headers={"Idempotency-Key": key})
+
+    def stock(self):
+        return Product.objects.values_list("stock", flat=True).get(pk=self.products[0].pk)
+
+    def test_retry_returns_the_first_order_without_writing(self):
+        first = self.place("retry-1")
+        self.assertEqual(first.status_code, 201)
+
+        with self.assertNumQueries(0):
+            retry = self.place("retry-1")
+
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(), 98)
+
+    def test_keys_are_per_user_and_request(self):
+        other = User.objects.create_user("other@example.com", "pass1234")
+        UserVendorRole.objects.create(user=other, vendor=self.vendor, role=UserVendorRole.ROLE_CUSTOMER)
+
+        self.assertEqual(self.place("key").status_code, 201)
+        self.assertEqual(self.place("key", user=other).status_code, 201)
+        self.assertEqual(self.place("another-key").status_code, 201)
+        self.assertEqual(Order.objects.count(), 3)
+
+        self.login(self.owner)
+        base = f"/app/vendors/{self.vendor.id}"
+        b"".join(self.client.post(
+            f"{base}/orders/bulk/", b"", content_type="application/x-ndjson", headers={"Idempotency-Key": "key"}
+        ).streaming_content)
+        response = self.client.post(
+            f"{base}/products/import/", b"", content_type="application/x-ndjson", headers={"Idempotency-Key": "key"}
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_key_reused_with_another_payload_is_refused(self):
+        self.assertEqual(self.place("payload").status_code, 201)
+
+        self.body = {"items": [{"product": self.products[1].id, "quantity": 5}]}
+        response = self.place("payload")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).stock, 100)
+
+    def test_duplicate_waits_for_the_request_in_flight(self):
+        first = self.place("slow")
+        results = caches["idempotency"]
+        stored_key = result_key(self.customer.pk, self.vendor.pk, "slow")
+        stored = results.get(stored_key)
+
+        # Replays the first request finishing while the duplicate waits on its lock.
+        results.delete(stored_key)
+        results.add(f"{stored_key}:lock", 1)
+
+        def finish():
+            results.set(stored_key, stored)
+            results.delete(f"{stored_key}:lock")
+
+        timer = threading.Timer(0.2, finish)
+        timer.start()
+        duplicate = self.place("slow")
+        timer.join()
+
+        self.assertEqual(duplicate.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+
+        results.add(result_key(self.customer.pk, self.vendor.pk, "slow-busy") + ":lock", 1)
+        with mock.patch("app.idempotency.WAIT", 0.1):
+            busy = self.client.post(self.url, self.body, format="json", headers={"Idempotency-Key": "slow-busy"})
+        self.assertEqual(busy.status_code, 409)
+        self.assertEqual(busy["Retry-After"], "1")
+
+    def test_bulk_feed_is_not_ingested_twice(self):
+        self.login(self.owner)
+        feed = json.dumps({"customer": self.customer.id, "items": [{"product": self.products[0].id, "quantity": 1}]})
+
+        def ingest():
+            response = self.client.generic(
+                "POST", f"{self.url}bulk/", feed.encode(),
+                content_type="application/x-ndjson", headers={"Idempotency-Key": "feed-1"},
+            )
+            return b"".join(response.streaming_content)
+
+        first = ingest()
+        self.assertEqual(ingest(), first)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(), 99)
+
+
+class CatalogImportExportTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.owner)
+        self.base = f"/app/vendors/{self.vendor.id}/products"
+
+    def test_csv_import_upserts_on_name(self):
+        body = (
+            "name,price,stock\n"
+            "Product 0,12.50,7\n"
+            "New product,3.00,1\n"
+            "Broken,not-a-price,1\n"
+        )
+        response = self.client.generic("POST", f"{self.base}/import/", body.encode(), content_type="text/csv")
+
+        report = response.json()
+        self.assertEqual((report["created"], report["updated"], report["failed"]), (1, 1, 1))
+        self.assertEqual(report["errors"][0]["line"], 4)
+
+        updated = Product.objects.get(pk=self.products[0].pk)
+        self.assertEqual((updated.price, updated.stock), (Decimal("12.50"), 7))
+        self.assertTrue(Product.objects.filter(vendor=self.vendor, name="New product").exists())
+
+    def test_ndjson_import_only_overwrites_supplied_fields(self):
+        body = json.dumps({"name": "Product 1", "price": "9.99"})
+        self.client.generic("POST", f"{self.base}/import/", body.encode(), content_type="application/x-ndjson")
+
+        product = Product.objects.get(pk=self.products[1].pk)
+        self.assertEqual((product.price, product.stock), (Decimal("9.99"), 100))
+
+    def test_export_streams_every_product(self):
+        response = self.client.get(f"{self.base}/export/")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "id,name,description,price,stock,is_active,created_at")
+        self.assertEqual(len(lines), 4)
+
+        response = self.client.get(f"{self.base}/export/?type=ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["name"] for row in rows], ["Product 0", "Product 1", "Product 2"])
+
+
+class CustomerOnboardingTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.owner)
+        self.url = f"/app/vendors/{self.vendor.id}/customers/import/"
+
+    def test_csv_import_creates_customers_in_bulk(self):
+        outsider = User.objects.create_user(email="outsider@example.com", password="pass1234")
+        body = (
+            "email,password,first_name,phone_number\n"
+            "new@example.com,secret123,New,5550100\n"
+            "second@example.com,another456,,\n"
+            "plain@example.com,,Plain,\n"
+            "staff@example.com,,,\n"
+            "outsider@example.com,hijacked,,\n"
+            "broken,,,\n"
+        )
+        response = self.client.generic("POST", self.url, body.encode(), content_type="text/csv")
+
+        report = response.json()
+        self.assertEqual((report["created"], report["existing"], report["failed"]), (3, 2, 1))
+        self.assertEqual(report["errors"][0]["line"], 7)
+
+        new = User.objects.get(email="new@example.com")
+        self.assertEqual(new.profile.phone_number, "5550100")
+        self.assertTrue(new.check_password("secret123"))
+        self.assertTrue(User.objects.get(email="second@example.com").check_password("another456"))
+        self.assertFalse(User.objects.get(email="plain@example.com").has_usable_password())
+        # Hashed in the request; plaintext is never queued.
+        self.assertFalse(Task.objects.exists())
+
+        # Only the accounts the import created are enrolled; existing ones are left alone.
+        self.assertEqual(
+            set(UserVendorRole.objects.filter(vendor=self.vendor, role=UserVendorRole.ROLE_CUSTOMER)
+                .values_list("user__email", flat=True)),
+            {"customer@example.com", "new@example.com", "second@example.com", "plain@example.com"},
+        )
+        self.assertFalse(UserVendorRole.objects.filter(user=outsider).exists())
+        outsider.refresh_from_db()
+        self.assertTrue(outsider.check_password("pass1234"))
+        self.assertEqual(UserVendorRole.objects.get(user=self.staff).role, UserVendorRole.ROLE_STAFF)
+
+    def test_endpoint_rejects_password_hashes(self):
+        body = json.dumps({"email": "legacy@example.com", "password_hash": make_password("chosen")})
+        response = self.client.generic("POST", self.url, body.encode(), content_type="application/x-ndjson")
+
+        report = response.json()
+        self.assertEqual((report["created"], report["failed"]), (0, 1))
+        self.assertIn("password_hash", report["errors"][0]["errors"])
+        self.assertFalse(User.objects.filter(email="legacy@example.com").exists())
+
+    def test_command_takes_password_hashes(self):
+        legacy = make_password("legacy-pass")
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as upload:
+            upload.write(f"email,password,password_hash\nlegacy@example.com,,{legacy}\nnew@example.com,secret123,\n")
+        self.addCleanup(os.remove, upload.name)
+        path = upload.name
+
+        call_command("onboard_users", path, "--vendor", str(self.vendor.pk), "--workers", "1", stdout=StringIO())
+
+        self.assertEqual(User.objects.get(email="legacy@example.com").password, legacy)
+        self.assertTrue(User.objects.get(email="new@example.com").check_password("secret123"))
+        self.assertEqual(
+            UserVendorRole.objects.filter(vendor=self.vendor, user__email__in=["legacy@example.com", "new@example.com"])
+            .count(), 2,
+        )
+        self.assertFalse(Task.objects.exists())
+
+    def test_only_owner_can_import(self):
+        self.login(self.staff)
+        body = json.dumps({"email": "new@example.com"})
+        response = self.client.generic("POST", self.url, body.encode(), content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(User.objects.filter(email="new@example.com").exists())
+
+    def test_registration_saves_once(self):
+        self.client.force_authenticate(None)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                "/accounts/register/", {"email": "signup@example.com", "password": "secret123"}, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len([q for q in queries if q["sql"].startswith("INSERT")]), 1)
+        self.assertFalse([q for q in queries if q["sql"].startswith("UPDATE")])
+
+
+class OrderExportTests(TenantTestCase):
+    def test_export_flattens_line_items_within_range(self):
+        self.create_orders(2)
+        old = Order.objects.create(customer=self.customer, vendor=self.vendor, total_amount=Decimal("10.00"))
+        OrderItem.objects.create(order=old, product=self.products[0], quantity=1, price=Decimal("10.00"))
+        Order.objects.filter(pk=old.pk).update(created_at="2020-01-15T00:00:00Z")
+        self.login(self.owner)
+
+        response = self.client.get(f"/app/vendors/{self.vendor.id}/orders/export/?start=2021-01-01")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(lines[0], ",".join(ORDER_EXPORT_FIELDS))
+        self.assertEqual(len(lines), 1 + 2 * 3)
+        self.assertNotIn(str(old.pk), {line.split(",")[0] for line in lines[1:]})
+
+    def test_command_reads_the_given_database(self):
+        self.create_orders(2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "orders.ndjson")
+            call_command("export_orders", self.vendor.pk, output=path, format="ndjson", database="default")
+            with open(path, encoding="utf-8") as export:
+                lines = [json.loads(line) for line in export]
+
+        self.assertEqual(len(lines), 2 * 3)
+        self.assertEqual(list(lines[0]), ORDER_EXPORT_FIELDS)
+
+    def test_invalid_date_is_rejected(self):
+        self.login(self.owner)
+        response = self.client.get(f"/app/vendors/{self.vendor.id}/orders/export/?start=yesterday")
+        self.assertEqual(response.status_code, 400)
+
+
+class VendorMoveTests(TenantTestCase):
+    def test_writes_are_refused_while_moving(self):
+        VendorShard.objects.create(vendor=self.vendor, alias="default", moving=True)
+        # The in-process map outlives the rollback; later classes write while setting up.
+        self.addCleanup(shard_map.invalidate)
+        self.login(self.staff)
+        base = f"/app/vendors/{self.vendor.id}/products/"
+
+        response = self.client.post(base, {"name": "New", "price": "1.00", "stock": 1}, format="json")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+        self.assertEqual(self.client.get(base).status_code, 200)
+
+    def test_placements_expire_when_the_cache_is_not_shared(self):
+        self.assertFalse(shard_map.get(self.vendor.pk).moving)
+        # Placed by another worker, whose invalidation this one cannot see.
+        VendorShard.objects.bulk_create([VendorShard(vendor=self.vendor, alias="default", moving=True)])
+        self.addCleanup(shard_map.invalidate)
+
+        with override_settings(SINGLE_WORKER_PROCESS=False):
+            self.assertFalse(shard_map.get(self.vendor.pk).moving)
+            with mock.patch("app.caching.LOCAL_MAP_MAX_AGE", 0):
+                self.assertTrue(shard_map.get(self.vendor.pk).moving)
+
+    @skipUnless(settings.DATABASE_SHARDS, "Set DATABASE_SHARDS to test moves between databases")
+    def test_moved_vendor_is_served_from_its_shard(self):
+        shard = settings.DATABASE_SHARDS[0]
+        self.create_orders(2)
+        created = sorted(Order.objects.values_list("created_at", flat=True))
+        rebuild_rollups([self.vendor.pk])
+
+        call_command("move_vendor", self.vendor.pk, shard, drain_seconds=0, stdout=StringIO())
+
+        self.assertFalse(Product.objects.using("default").filter(vendor=self.vendor).exists())
+        self.assertEqual(Order.objects.using(shard).filter(vendor=self.vendor).count(), 2)
+        self.assertEqual(VendorSalesRollup.objects.using(shard).count(), 1)
+
+        self.login(self.customer)
+        base = f"/app/vendors/{self.vendor.id}"
+        self.assertEqual(len(self.client.get(f"{base}/products/").json()["results"]), 3)
+        response = self.client.post(
+            f"{base}/orders/", {"items": [{"product": self.products[0].pk, "quantity": 1}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        orders = self.client.get(f"{base}/orders/").json()["results"]
+        self.assertEqual([order["customer"]["email"] for order in orders], ["customer@example.com"] * 3)
+
+        call_command("move_vendor", self.vendor.pk, "default", drain_seconds=0, stdout=StringIO())
+
+        self.assertFalse(Order.objects.using(shard).exists())
+        self.assertEqual(Order.objects.using("default").filter(vendor=self.vendor).count(), 3)
+        # Rows are copied as they are, timestamps included.
+        self.assertEqual(sorted(Order.objects.values_list("created_at", flat=True))[:2], created)
+
+    @skipUnless(settings.DATABASE_SHARDS, "Set DATABASE_SHARDS to test moves between databases")
+    def test_export_command_reads_the_vendors_shard(self):
+        shard = settings.DATABASE_SHARDS[0]
+        self.create_orders(2)
+        call_command("move_vendor", self.vendor.pk, shard, drain_seconds=0, stdout=StringIO())
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "orders.csv")
+            call_command("export_orders", self.vendor.pk, output=path)
+            with open(path, encoding="utf-8") as export:
+                self.assertEqual(len(export.read().splitlines()), 1 + 2 * 3)
+
+            call_command("export_orders", self.vendor.pk, output=path, database="default")
+            with open(path, encoding="utf-8") as export:
+                self.assertEqual(export.read().splitlines(), [",".join(ORDER_EXPORT_FIELDS)])
+
+    @skipUnless(settings.DATABASE_SHARDS, "Set DATABASE_SHARDS to test moves between databases")
+    def test_rows_written_after_moves_keep_unique_ids(self):
+        shard = settings.DATABASE_SHARDS[0]
+        other = Vendor.objects.create(user=self.owner, store_name="Other")
+
+        def add_product(vendor, name):
+            with using_vendor(vendor.pk):
+                return Product.objects.create(vendor=vendor, name=name, price=Decimal("1.00"), stock=1)
+
+        def move(vendor, target):
+            call_command("move_vendor", vendor.pk, target, drain_seconds=0, stdout=StringIO())
+
+        move(self.vendor, shard)
+        on_shard = add_product(self.vendor, "Added on the shard")
+        on_default = add_product(other, "Added on default")
+        self.assertEqual(Product.objects.using(shard).get(pk=on_shard.pk).name, "Added on the shard")
+        self.assertGreater(on_shard.pk, SHARD_ID_SPAN)
+        self.assertLess(on_default.pk, SHARD_ID_SPAN)
+
+        move(other, shard)
+        add_product(other, "Added after its move")
+        move(self.vendor, "default")
+        add_product(self.vendor, "Added back on default")
+        move(other, "default")
+
+        ids = list(Product.objects.using("default").values_list("pk", flat=True))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), 3 + 4)
+        self.assertFalse(Product.objects.using(shard).exists())
+
+
+class SalesRollupTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.orders_url = f"/app/vendors/{self.vendor.id}/orders/"
+        self.dashboard_url = f"/app/vendors/{self.vendor.id}/dashboard/sales/"
+
+    def place(self, quantity):
+        self.login(self.customer)
+        response = self.client.post(
+            self.orders_url, {"items": [{"product": self.products[0].id, "quantity": quantity}]}, format="json"
+        )
+        return response.json()["id"]
+
+    def rollups(self):
+        run_due_tasks(shard_aliases())
+        return {
+            row.status: (row.order_count, row.revenue, row.units)
+            for row in VendorSalesRollup.objects.filter(vendor=self.vendor)
+        }
+
+    def test_rollups_follow_order_creation_and_status_changes(self):
+        order_id = self.place(2)
+        self.place(1)
+        self.assertEqual(self.rollups(), {Order.STATUS_PENDING: (2, Decimal("30.00"), 3)})
+
+        self.login(self.staff)
+        self.client.patch(f"{self.orders_url}{order_id}/", {"status": Order.STATUS_PAID}, format="json")
+        self.assertEqual(self.rollups(), {
+            Order.STATUS_PENDING: (1, Decimal("10.00"), 1),
+            Order.STATUS_PAID: (1, Decimal("20.00"), 2),
+        })
+
+        incremental = self.rollups()
+        rebuild_rollups([self.vendor.id])
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_dashboard_reads_only_rollups(self):
+        self.place(2)
+        run_due_tasks(shard_aliases())
+        self.login(self.owner)
+        self.client.get(self.dashboard_url)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.dashboard_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["totals"], {
+            Order.STATUS_PENDING: {"order_count": 1, "revenue": "20.00", "units": 2},
+        })
+
+        self.login(self.customer)
+        self.assertEqual(self.client.get(self.dashboard_url).status_code, 403)
+
+
+@task("tests.flaky")
+def flaky(fail_times, product_id):
+    task_row = Task.objects.get(name="tests.flaky")
+    Product.objects.filter(pk=product_id).update(stock=7)
+    if task_row.attempts <= fail_times:
+        raise RuntimeError("flaky")
+
+
+class TaskQueueTests(TenantTestCase):
+    def stock(self):
+        return Product.objects.values_list("stock", flat=True).get(pk=self.products[0].pk)
+
+    def test_failed_task_is_retried_later_and_its_writes_rolled_back(self):
+        enqueue("tests.flaky", fail_times=1, product_id=self.products[0].pk)
+
+        with self.assertLogs("app.tasks", "ERROR"):
+            self.assertEqual(run_due_tasks(), 1)
+        row = Task.objects.get()
+        self.assertEqual((row.status, row.attempts), (Task.STATUS_PENDING, 1))
+        self.assertIn("RuntimeError: flaky", row.last_error)
+        self.assertGreater(row.run_at, row.created_at)
+        self.assertNotEqual(self.stock(), 7)
+
+        Task.objects.update(run_at=row.created_at)
+        run_due_tasks()
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(self.stock(), 7)
+
+    def test_task_fails_for_good_after_max_attempts(self):
+        enqueue("tests.flaky", fail_times=99, product_id=self.products[0].pk)
+        Task.objects.update(max_attempts=2)
+
+        with self.assertLogs("app.tasks", "ERROR") as logs:
+            for _ in range(3):
+                Task.objects.update(run_at=Task.objects.get().created_at)
+                run_due_tasks()
+
+        self.assertIn("giving up", logs.output[-1])
+
+        row = Task.objects.get()
+        self.assertEqual((row.status, row.attempts), (Task.STATUS_FAILED, 2))
+
+    def test_expired_lease_is_claimed_again_and_the_old_worker_loses_it(self):
+        enqueue("tests.flaky", fail_times=0, product_id=self.products[0].pk)
+        stale = claim("default", 10)[0]
+        self.assertEqual(claim("default", 10), [])
+
+        Task.objects.update(locked_until=stale.created_at)
+        fresh = claim("default", 10)[0]
+        self.assertNotEqual(fresh.locked_by, stale.locked_by)
+
+        with self.assertLogs("app.tasks", "WARNING"):
+            self.assertFalse(run(stale, "default"))
+        self.assertNotEqual(self.stock(), 7)
+        self.assertTrue(run(fresh, "default"))
+        self.assertEqual(self.stock(), 7)
+
+    def test_order_mail_is_sent_by_the_worker(self):
+        self.login(self.customer)
+        response = self.client.post(
+            f"/app/vendors/{self.vendor.id}/orders/",
+            {"items": [{"product": self.products[0].id, "quantity": 1}]}, format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+
+        run_due_tasks(shard_aliases())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["customer@example.com"])
+        self.assertIn(f"Order #{response.json()['id']} from Acme", mail.outbox[0].subject)
+
+
+class ProductSearchTests(TenantTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Product.objects.create(
+            vendor=cls.vendor, name="Trail running shoe", description="Grippy outsole", price=Decimal("80.00"), stock=5
+        )
+        Product.objects.create(
+            vendor=cls.vendor, name="Wool socks", description="Pairs well with running shoes", price=Decimal("9.00")
+        )
+        Product.objects.create(
+            vendor=cls.vendor, name="Retired shoe", price=Decimal("50.00"), stock=5, is_active=False
+        )
+        other = Vendor.objects.create(user=cls.owner, store_name="Other")
+        Product.objects.create(vendor=other, name="Running shoe", price=Decimal("60.00"), stock=5)
+
+    def search(self, query):
+        self.login(self.customer)
+        response = self.client.get(f"/app/vendors/{self.vendor.id}/products/search/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return [product["name"] for product in response.json()["results"]]
+
+    def test_prefix_terms_ranked_by_name_first(self):
+        self.assertEqual(self.search("q=runn+sho"), ["Trail running shoe", "Wool socks"])
+
+    def test_filters(self):
+        self.assertEqual(self.search("q=shoe&in_stock=1"), ["Trail running shoe"])
+        self.assertEqual(self.search("q=shoe&max_price=20"), ["Wool socks"])
+        self.assertEqual(self.search("q=retired&is_active=all"), ["Retired shoe"])
+
+    def test_like_fallback_without_fts(self):
+        with mock.patch("app.search.uses_fts", return_value=False):
+            self.assertEqual(self.search("q=runn+sho"), ["Trail running shoe", "Wool socks"])
+            self.assertEqual(self.search("q=shoe&in_stock=1"), ["Trail running shoe"])
+
+    def test_index_follows_updates_and_deletes(self):
+        product = Product.objects.get(name="Wool socks")
+        product.name = "Merino socks"
+        product.save()
+        self.assertEqual(self.search("q=merino"), ["Merino socks"])
+
+        product.delete()
+        self.assertEqual(self.search("q=merino"), [])
+
+
+class CatalogConditionalGetTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.customer)
+        self.list_url = f"/app/vendors/{self.vendor.id}/products/"
+        self.detail_url = f"{self.list_url}{self.products[0].id}/"
+
+    def test_unchanged_catalog_is_answered_without_serializing(self):
+        # The detail view only checks that the product is still there.
+        for url, queries in ((self.list_url, 0), (self.detail_url, 1)):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+            with self.assertNumQueries(queries):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, 304)
+
+    def test_matching_etag_does_not_hide_a_missing_product(self):
+        etag = self.client.get(self.list_url)["ETag"]
+        response = self.client.get(f"{self.list_url}999999/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.list_url)["Last-Modified"]
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get(self.list_url)["ETag"]
+
+        product = self.products[1]
+        product.price = Decimal("12.00")
+        product.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.client.post(
+            f"/app/vendors/{self.vendor.id}/orders/",
+            {"items": [{"product": product.id, "quantity": 1}]},
+            format="json",
+        )
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+    def test_versions_expire_when_the_cache_is_not_shared(self):
+        other_worker = LocMemCache("other-worker", {})
+
+        with override_settings(SINGLE_WORKER_PROCESS=False):
+            etag = self.client.get(self.list_url)["ETag"]
+            # Another worker changes the catalog; its bump stays in its own cache.
+            with mock.patch("app.catalog.cache", other_worker):
+                Product.objects.filter(pk=self.products[0].pk).update(stock=7)
+                bump_catalog_version(self.vendor.pk)
+            later = time.time() + caching.LOCAL_MAP_MAX_AGE + 1
+            with mock.patch("time.time", return_value=later):
+                response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+
+
+class CatalogResponseCacheTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login(self.customer)
+        self.list_url = f"/app/vendors/{self.vendor.id}/products/"
+
+    def test_listing_is_served_from_cache_until_the_catalog_changes(self):
+        first = self.client.get(self.list_url).json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.list_url).json(), first)
+        # Different query, different entry.
+        with self.assertNumQueries(1):
+            self.client.get(self.list_url, {"page_size": 1})
+
+        product = self.products[0]
+        product.stock = 7
+        product.save()
+        stocks = {p["id"]: p["stock"] for p in self.client.get(self.list_url).json()["results"]}
+        self.assertEqual(stocks[product.id], 7)
+
+    def test_entries_expire_when_the_cache_is_not_shared(self):
+        responses = catalog_cache()
+        with override_settings(SINGLE_WORKER_PROCESS=False):
+            with mock.patch.object(responses, "set", wraps=responses.set) as store:
+                self.client.get(self.list_url)
+        self.assertEqual(store.call_args.args[2], caching.LOCAL_MAP_MAX_AGE)
+
+    def test_concurrent_misses_build_once(self):
+        builds = []
+        barrier = threading.Barrier(4)
+
+        def build():
+            builds.append(1)
+            time.sleep(0.1)
+            return {"built": True}
+
+        def fetch(results):
+            barrier.wait()
+            results.append(get_or_build("stampede-test", build))
+
+        results = []
+        threads = [threading.Thread(target=fetch, args=(results,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [{"built": True}] * 4)
+
+
+class AsyncReadPathTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_orders(3)
+        self.create_orders(2, customer=self.staff)
+
+    async def get(self, user, url, **headers):
+        token = RefreshToken.for_user(user).access_token
+        return await AsyncClient().get(url, headers={"Authorization": f"Bearer {token}", **headers})
+
+    def sync_json(self, user, url):
+        self.login(user)
+        return self.client.get(url).json()
+
+    async def test_async_endpoints_match_the_sync_ones(self):
+        base = f"/app/vendors/{self.vendor.id}"
+        order = await Order.objects.afirst()
+        cases = [
+            (self.owner, "/app/vendors/", "/app/async/vendors/"),
+            (self.customer, f"{base}/products/", f"/app/async{base[4:]}/products/"),
+            (self.customer, f"{base}/products/{self.products[0].id}/",
+             f"/app/async{base[4:]}/products/{self.products[0].id}/"),
+            (self.owner, f"{base}/orders/?page_size=2", f"/app/async{base[4:]}/orders/?page_size=2"),
+            (self.customer, f"{base}/orders/", f"/app/async{base[4:]}/orders/"),
+            (self.owner, f"{base}/orders/{order.id}/", f"/app/async{base[4:]}/orders/{order.id}/"),
+        ]
+        for user, sync_url, async_url in cases:
+            expected = await sync_to_async(self.sync_json)(user, sync_url)
+            response = await self.get(user, async_url)
+            self.assertEqual(response.status_code, 200, async_url)
+            data = response.json()
+            if "next" in data:
+                # Page links point at their own endpoint.
+                data["next"] = data["next"] and data["next"].replace("/app/async/", "/app/")
+            self.assertEqual(data, expected, async_url)
+
+    async def test_customers_only_see_their_orders(self):
+        response = await self.get(self.customer, f"/app/async/vendors/{self.vendor.id}/orders/")
+        self.assertEqual(len(response.json()["results"]), 3)
+
+    async def test_requires_a_valid_token(self):
+        url = f"/app/async/vendors/{self.vendor.id}/products/"
+        self.assertEqual((await AsyncClient().get(url)).status_code, 401)
+        response = await AsyncClient().get(url, headers={"Authorization": "Bearer not-a-token"})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_conditional_get(self):
+        url = f"/app/async/vendors/{self.vendor.id}/products/"
+        etag = (await self.get(self.customer, url))["ETag"]
+        self.assertEqual((await self.get(self.customer, url, **{"If-None-Match": etag})).status_code, 304)
+        response = await self.get(self.customer, f"{url}999999/", **{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 404)
+
+
+class TenantThrottleTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f"/app/vendors/{self.vendor.id}/products/"
+
+    def get(self, user):
+        self.login(user)
+        return self.client.get(self.url)
+
+    def test_bucket_refills_at_its_rate(self):
+        rate = parse_rate("2/s")
+        self.assertEqual([take("bucket", rate, 100.0) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(take("bucket", rate, 100.0), 0.5)
+        self.assertAlmostEqual(take("bucket", rate, 100.25), 0.25)
+        self.assertEqual(take("bucket", rate, 100.5), 0)
+        self.assertEqual(take("bucket", rate, 200.0), 0)
+
+    def test_user_quota_of_one_vendor(self):
+        with self.settings(TENANT_THROTTLE_QUOTAS={self.vendor.pk: {"user": "2/min"}}):
+            self.assertEqual([self.get(self.customer).status_code for _ in range(2)], [200, 200])
+            refused = self.get(self.customer)
+            self.assertEqual(refused.status_code, 429)
+            self.assertEqual(refused["Retry-After"], "30")
+
+            # Other users of the vendor, and other vendors, keep their own buckets.
+            self.assertEqual(self.get(self.staff).status_code, 200)
+            other = Vendor.objects.create(user=self.owner, store_name="Other")
+            self.assertEqual(self.client.get(f"/app/vendors/{other.id}/products/").status_code, 200)
+
+    def test_vendor_bucket_is_shared_by_its_users(self):
+        with self.settings(TENANT_THROTTLE_QUOTAS={self.vendor.pk: {"vendor": "2/min"}}):
+            self.assertEqual(self.get(self.customer).status_code, 200)
+            self.assertEqual(self.get(self.staff).status_code, 200)
+            self.assertEqual(self.get(self.owner).status_code, 429)
+
+    async def test_async_views_are_throttled(self):
+        token = RefreshToken.for_user(self.customer).access_token
+        url = f"/app/async/vendors/{self.vendor.id}/products/"
+        with self.settings(TENANT_THROTTLE_QUOTAS={self.vendor.pk: {"user": "1/min"}}):
+            statuses = [
+                (await AsyncClient().get(url, headers={"Authorization": f"Bearer {token}"})).status_code
+                for _ in range(2)
+            ]
+        self.assertEqual(statuses, [200, 429])
+
+
+class AdminChangelistTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        admin_user = User.objects.create_superuser("admin@example.com", "pass1234")
+        self.client.force_login(admin_user)
+        self.create_orders(3)
+
+    def changelist(self, model, query=""):
+        return self.client.get(f"/admin/app/{model._meta.model_name}/{query}")
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        models = [Vendor, UserVendorRole, Product, Order, OrderItem, VendorSalesRollup, VendorShard, Task]
+        counts = {}
+        for model in models:
+            self.changelist(model)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.changelist(model).status_code, 200, model.__name__)
+            counts[model] = len(queries)
+
+        self.create_orders(20)
+        for model in models:
+            with self.assertNumQueries(counts[model]):
+                self.changelist(model)
+
+    def test_large_unfiltered_counts_are_estimated(self):
+        with mock.patch("app.admin.ADMIN_COUNT_LIMIT", 2), mock.patch("app.admin.estimated_rows", return_value=1000):
+            paginator = EstimatedCountPaginator(Order.objects.order_by("-id"), 100)
+            self.assertEqual(paginator.count, 1000)
+            paginator = EstimatedCountPaginator(Order.objects.filter(vendor=self.vendor).order_by("-id"), 100)
+            self.assertEqual(paginator.count, 3)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.assertEqual(estimated_rows(Order, "default"), 3)
+
+        response = self.changelist(Order, "?status__exact=pending&created_at__year=2000")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 0)
+
+
+@override_settings(ALLOWED_HOSTS=["localhost", "testserver"])
+class LoadToolingTests(TenantTestCase):
+    def generate(self, **options):
+        options = {"vendors": 2, "products": 10, "orders": 30, "customers": 6, "staff": 1, "prefix": "gen", **options}
+        call_command("generate_data", *[f"--{name}={value}" for name, value in options.items()], stdout=StringIO())
+
+    def benchmark(self, *args):
+        out = StringIO()
+        call_command("benchmark", "--iterations=2", "--warmup=1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_generate_data_builds_consistent_tenants(self):
+        self.generate()
+
+        vendors = Vendor.objects.filter(store_name__startswith="gen")
+        self.assertEqual(vendors.count(), 2)
+        self.assertEqual(User.objects.filter(email__startswith="gen-").count(), 2 + 2 + 6)
+        roles = UserVendorRole.objects.filter(vendor__in=vendors)
+        self.assertEqual(roles.filter(role=UserVendorRole.ROLE_OWNER).count(), 2)
+        self.assertEqual(roles.filter(role=UserVendorRole.ROLE_STAFF).count(), 2)
+        # Every customer shops at two vendors by default.
+        self.assertEqual(roles.filter(role=UserVendorRole.ROLE_CUSTOMER).count(), 12)
+        self.assertEqual(Product.objects.filter(vendor__in=vendors).count(), 20)
+
+        orders = Order.objects.filter(vendor__in=vendors).prefetch_related("items")
+        self.assertEqual(len(orders), 60)
+        for order in orders:
+            items = list(order.items.all())
+            self.assertTrue(1 <= len(items) <= 20)
+            self.assertEqual(order.total_amount, sum(item.quantity * item.price for item in items))
+            self.assertTrue(roles.filter(user_id=order.customer_id, vendor_id=order.vendor_id).exists())
+
+        self.assertEqual(len(set(User.objects.filter(email__startswith="gen-").values_list("password", flat=True))), 1)
+        self.assertTrue(User.objects.get(email="gen-customer0@example.com").check_password("load-test-pass"))
+        self.assertEqual(tenant_map.get(vendors[0].pk).store_name, vendors[0].store_name)
+        self.assertTrue(VendorSalesRollup.objects.filter(vendor__in=vendors).exists())
+
+    def test_benchmark_covers_every_url_and_rolls_back(self):
+        self.generate(vendors=1)
+        vendor = Vendor.objects.get(store_name__startswith="gen")
+        counts = (User.objects.count(), Product.objects.count(), Order.objects.count(), Task.objects.count())
+
+        output = self.benchmark(f"--vendor={vendor.pk}", "--only=order-list-create|product-import")
+
+        self.assertNotIn("No benchmark scenario", output)
+        self.assertIn("order-list-create POST", output)
+        self.assertNotIn("order-detail", output)
+        self.assertEqual(
+            (User.objects.count(), Product.objects.count(), Order.objects.count(), Task.objects.count()), counts
+        )
+
+    def test_benchmark_flags_regressions_against_a_baseline(self):
+        self.generate(vendors=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            self.benchmark("--only=^order-list-create GET$", f"--save={path}")
+            with open(path) as saved:
+                baseline = json.load(saved)
+            self.assertEqual(
+                set(baseline["order-list-create GET"]),
+                {"p50_ms", "p95_ms", "p99_ms", "mean_ms", "queries", "peak_kb"},
+            )
+
+            self.benchmark("--only=^order-list-create GET$", f"--baseline={path}", "--threshold=1000", "--fail-on-regression")
+
+            baseline["order-list-create GET"]["queries"] -= 1
+            with open(path, "w") as saved:
+                json.dump(baseline, saved)
+            with self.assertRaisesMessage(CommandError, "order-list-create GET"):
+                self.benchmark("--only=^order-list-create GET$", f"--baseline={path}", "--threshold=1000", "--fail-on-regression")
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, method, reads=1, write=False):
+        """Runs a request through the middleware, returning the database of each read."""
+        seen = []
+
+        def view(request):
+            for _ in range(reads):
+                seen.append(router.db_for_read(Product))
+            if write:
+                router.db_for_write(Product)
+                seen.append(router.db_for_read(Product))
+            return None
+
+        ReplicaReadMiddleware(view)(RequestFactory().generic(method, "/"))
+        return seen
+
+    def test_safe_requests_stick_to_one_replica(self):
+        seen = self.route("GET", reads=10)
+        self.assertIn(seen[0], ["replica1", "replica2"])
+        self.assertEqual(set(seen), {seen[0]})
+
+    def test_reads_after_a_write_go_to_the_primary(self):
+        self.assertEqual(self.route("GET", write=True)[-1], "default")
+        self.assertEqual(self.route("POST"), ["default"])
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(router.db_for_read(Product), "default")
+        self.assertEqual(router.db_for_write(Product), "default")
+
+
+class MetricsTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.list_url = f"/app/vendors/{self.vendor.id}/orders/"
+
+    def test_requests_are_recorded_per_url_name(self):
+        self.login(self.owner)
+        self.create_orders(2)
+        self.client.get(self.list_url)
+        self.client.get(self.list_url)
+
+        stats = registry.snapshot()[("order-list-create", "GET")]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["statuses"], {200: 2})
+        self.assertGreater(stats["queries"], 0)
+        self.assertGreater(stats["serialize_seconds"], 0)
+        self.assertGreater(stats["render_seconds"], 0)
+        self.assertLess(stats["serialize_seconds"], stats["seconds"])
+
+        body = self.client.get("/metrics/").content.decode()
+        self.assertIn('serializer_duration_seconds_total{view="order-list-create",method="GET"}', body)
+        self.assertIn('http_request_duration_seconds_count{view="order-list-create",method="GET"} 2', body)
+        self.assertIn('http_requests_total{view="order-list-create",method="GET",status="200"} 2', body)
+
+    def test_metrics_are_internal(self):
+        response = self.client.get("/metrics/", REMOTE_ADDR="203.0.113.7")
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(SLOW_REQUEST_SECONDS=0, SLOW_REQUEST_TOP_QUERIES=1)
+    def test_slow_requests_are_logged_with_their_slowest_query(self):
+        self.login(self.owner)
+        with self.assertLogs("app.performance", "WARNING") as logs:
+            self.client.get(self.list_url)
+        self.assertIn("(order-list-create)", logs.output[0])
+        self.assertEqual(logs.output[0].count("SELECT"), 1)
+
+
+@skipUnless(connection.vendor == "sqlite", "Query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(TenantTestCase):
+    """
+    Runs EXPLAIN QUERY PLAN over every SELECT a hot endpoint issues and fails if any
+    of them scans a whole table or sorts through a temporary B-tree.
+    """
+
+    # "SCAN t" without an index is a full table scan; FTS5 virtual table scans are index lookups.
+    BAD_PLAN = re.compile(r"^SCAN (?!.*(USING (COVERING )?INDEX|VIRTUAL TABLE))|USE TEMP B-TREE")
+
+    def setUp(self):
+        super().setUp()
+        self.create_orders(5)
+        self.order = Order.objects.first()
+        self.base = f"/app/vendors/{self.vendor.id}"
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, user, url, sorts=False):
+        self.login(user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Keep the tenant map warm but make the role lookup and the catalog read
+        # part of the measured request.
+        invalidate_user_role(user.pk, self.vendor.pk)
+        caches["catalog"].clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        selects = [q["sql"] for q in queries.captured_queries if q["sql"].lstrip().upper().startswith("SELECT")]
+        self.assertTrue(selects)
+        for sql in selects:
+            for detail in self.explain(sql):
+                if sorts and detail == "USE TEMP B-TREE FOR ORDER BY":
+                    continue
+                self.assertIsNone(self.BAD_PLAN.search(detail), f"{url}: {detail}\n{sql}")
+
+    def test_vendor_list(self):
+        self.assert_plans_use_indexes(self.owner, "/app/vendors/")
+
+    def test_product_list_and_next_page(self):
+        self.assert_plans_use_indexes(self.customer, f"{self.base}/products/")
+        self.login(self.customer)
+        next_page = self.client.get(f"{self.base}/products/?page_size=1").json()["next"]
+        self.assert_plans_use_indexes(self.customer, next_page)
+
+    def test_product_detail(self):
+        self.assert_plans_use_indexes(self.customer, f"{self.base}/products/{self.products[0].id}/")
+
+    def test_product_search(self):
+        # Ranking sorts the vendor's matches, which FTS5 would otherwise sort itself.
+        self.assert_plans_use_indexes(self.customer, f"{self.base}/products/search/?q=prod&in_stock=1", sorts=True)
+
+    def test_order_list_for_staff(self):
+        self.assert_plans_use_indexes(self.owner, f"{self.base}/orders/")
+
+    def test_order_list_for_customer(self):
+        self.assert_plans_use_indexes(self.customer, f"{self.base}/orders/")
+
+    def test_order_list_next_page(self):
+        self.login(self.owner)
+        next_page = self.client.get(f"{self.base}/orders/?page_size=2").json()["next"]
+        self.assert_plans_use_indexes(self.owner, next_page)
+
+    def test_order_detail(self):
+        self.assert_plans_use_indexes(self.owner, f"{self.base}/orders/{self.order.id}/")
+
+    def test_sales_dashboard(self):
+        rebuild_rollups([self.vendor.id])
+        self.assert_plans_use_indexes(self.owner, f"{self.base}/dashboard/sales/?start=2020-01-01")
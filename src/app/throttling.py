@@ -0,0 +1,159 @@
+# app/throttling.py
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# A bucket that is not refilled is dropped after this many seconds; it is full
+# by then anyway for any rate slower than one request a day.
+BUCKET_TIMEOUT = 24 * 60 * 60
+
+MICROSECONDS = 1_000_000
+
+
+def throttle_cache():
+    return caches["throttle"]
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``"600/min"`` -> ``(interval, capacity)``: microseconds per token and per full bucket. ``None`` is no limit."""
+    if rate is None:
+        return None
+    count, period = rate.split("/")
+    interval = THROTTLE_PERIODS[period[0]] * MICROSECONDS // int(count)
+    return interval, interval * int(count)
+
+
+def tenant_rates(vendor_id):
+    """The vendor's ``(user, vendor)`` rates: ``TENANT_THROTTLE_RATES`` with its ``TENANT_THROTTLE_QUOTAS`` entry on top."""
+    rates = {**settings.TENANT_THROTTLE_RATES, **settings.TENANT_THROTTLE_QUOTAS.get(vendor_id, {})}
+    return parse_rate(rates["user"]), parse_rate(rates["vendor"])
+
+
+def bucket_keys(vendor_id, ident):
+    return f"throttle:{vendor_id}:{ident}", f"throttle:{vendor_id}"
+
+
+def give_back(key, rate):
+    try:
+        throttle_cache().decr(key, rate[0])
+    except ValueError:
+        pass
+
+
+async def agive_back(key, rate):
+    try:
+        await throttle_cache().adecr(key, rate[0])
+    except ValueError:
+        pass
+
+
+def take(key, rate, now):
+    """
+    Takes a token from the bucket at ``key``; returns 0, or the seconds until one is free.
+
+    The bucket is kept as the time, in microseconds, at which it will be full
+    again (GCRA). Taking a token pushes that time one interval ahead with a
+    single atomic ``incr``, so concurrent requests need no lock or
+    read-modify-write; a refused request gives its token back.
+    """
+    if rate is None:
+        return 0
+    interval, capacity = rate
+    now = int(now * MICROSECONDS)
+    buckets = throttle_cache()
+    try:
+        full_at = buckets.incr(key, interval)
+    except ValueError:
+        full_at = None
+    if full_at is None or full_at - interval < now:
+        # A new bucket, or one that has filled up again: count from now. Two
+        # requests racing here can each get a token from the same refill.
+        full_at = now + interval
+        buckets.set(key, full_at, BUCKET_TIMEOUT)
+    over = full_at - now - capacity
+    if over > 0:
+        give_back(key, rate)
+        return over / MICROSECONDS
+    return 0
+
+
+async def atake(key, rate, now):
+    if rate is None:
+        return 0
+    interval, capacity = rate
+    now = int(now * MICROSECONDS)
+    buckets = throttle_cache()
+    try:
+        full_at = await buckets.aincr(key, interval)
+    except ValueError:
+        full_at = None
+    if full_at is None or full_at - interval < now:
+        full_at = now + interval
+        await buckets.aset(key, full_at, BUCKET_TIMEOUT)
+    over = full_at - now - capacity
+    if over > 0:
+        await agive_back(key, rate)
+        return over / MICROSECONDS
+    return 0
+
+
+def check(vendor_id, ident):
+    """
+    Takes a token from the user's bucket and then from the vendor's.
+
+    Returns 0 when the request may go ahead, otherwise the seconds to wait. A
+    user refused by the vendor's bucket gets their token back.
+    """
+    user_rate, vendor_rate = tenant_rates(vendor_id)
+    user_key, vendor_key = bucket_keys(vendor_id, ident)
+    now = time.time()
+    wait = take(user_key, user_rate, now)
+    if not wait:
+        wait = take(vendor_key, vendor_rate, now)
+        if wait and user_rate is not None:
+            give_back(user_key, user_rate)
+    return wait
+
+
+async def acheck(vendor_id, ident):
+    user_rate, vendor_rate = tenant_rates(vendor_id)
+    user_key, vendor_key = bucket_keys(vendor_id, ident)
+    now = time.time()
+    wait = await atake(user_key, user_rate, now)
+    if not wait:
+        wait = await atake(vendor_key, vendor_rate, now)
+        if wait and user_rate is not None:
+            await agive_back(user_key, user_rate)
+    return wait
+
+
+class TenantRateThrottle(BaseThrottle):
+    """
+    Fair share per tenant: a token bucket for the vendor's traffic as a whole and
+    one per user (or client address) within it.
+
+    One vendor's bots use up that vendor's quota instead of every worker. Buckets
+    live in the ``throttle`` cache. Requests outside a vendor are not throttled.
+    """
+
+    def allow_request(self, request, view):
+        vendor = getattr(request, "tenant", None)
+        if vendor is None:
+            self.wait_seconds = 0
+            return True
+        self.wait_seconds = check(vendor.pk, self.client_ident(request))
+        return not self.wait_seconds
+
+    def client_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+    def wait(self):
+        return self.wait_seconds
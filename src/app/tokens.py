@@ -0,0 +1,96 @@
+# app/tokens.py
+import time
+
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+from app.caching import cache_is_shared
+from app.models import UserVendorRole
+
+ROLES_CLAIM = "roles"
+ROLE_VERSION_CLAIM = "role_version"
+
+# Users with more memberships than this get no roles claim and fall back to
+# role lookups, so tokens stay small enough for a request header.
+MAX_ROLE_CLAIMS = 50
+
+
+def role_version_key(user_id):
+    return f"role-version:{user_id}"
+
+
+def role_version(user_id):
+    """
+    Returns the user's role version; it moves whenever the user or their roles change.
+
+    A version lost from the cache is restarted, which only makes older tokens fall
+    back to database lookups.
+    """
+    key = role_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def arole_version(user_id):
+    key = role_version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_role_version(user_id):
+    cache.set(role_version_key(user_id), time.time_ns(), None)
+
+
+def add_role_claims(token, user_id):
+    """Stamps ``{vendor_id: role}`` and the current role version onto ``token``."""
+    # Version first: a change racing with the read below makes the claims stale, never wrong.
+    token[ROLE_VERSION_CLAIM] = role_version(user_id)
+    roles = list(
+        UserVendorRole.objects.filter(user_id=user_id).values_list("vendor_id", "role")[:MAX_ROLE_CLAIMS + 1]
+    )
+    if len(roles) <= MAX_ROLE_CLAIMS:
+        token[ROLES_CLAIM] = {str(vendor_id): role for vendor_id, role in roles}
+    else:
+        # Access tokens copy the claims of their refresh token, login-time roles included.
+        token.payload.pop(ROLES_CLAIM, None)
+    return token
+
+
+def claimed_roles(request):
+    """
+    The ``{vendor_id: role}`` claim of the request's token, or ``None`` when the
+    roles have to be looked up (session auth, stale or oversized tokens, or a
+    cache that other workers do not see).
+    """
+    if not isinstance(request.user, TokenUser) or not cache_is_shared():
+        return None
+    return request.auth.get(ROLES_CLAIM)
+
+
+def is_current(token, version):
+    """Whether ``token``'s claims may be trusted; never while role versions are kept per process."""
+    return cache_is_shared() and ROLE_VERSION_CLAIM in token and token[ROLE_VERSION_CLAIM] == version
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates from the token alone while its role version is current.
+
+    The principal is a ``TokenUser`` and vendor roles come from the token's
+    claims, so the hot path runs no user or role query. Once the user or their
+    roles change, older tokens are authenticated like ``JWTAuthentication`` (user
+    row loaded, inactive users rejected) until the client refreshes them.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if is_current(validated_token, role_version(user.pk)):
+            return user
+        return JWTAuthentication.get_user(self, validated_token)
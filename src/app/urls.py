@@ -1,12 +1,28 @@
 from django.urls import path
+from app.async_views import (
+    AsyncVendorListView,
+    AsyncProductListView,
+    AsyncProductDetailView,
+    AsyncOrderListView,
+    AsyncOrderDetailView,
+)
 from app.views import (
     VendorListCreateAPIView,
 
     ProductListCreateAPIView,
     ProductDetailAPIView,
+    ProductSearchAPIView,
+    ProductExportAPIView,
+    ProductImportAPIView,
+
+    CustomerImportAPIView,
 
     OrderListCreateAPIView,
     OrderDetailAPIView,
+    OrderBulkCreateAPIView,
+    OrderExportAPIView,
+
+    VendorSalesDashboardAPIView,
 
     AssignVendorRoleAPIView,
 )
@@ -18,10 +34,26 @@ urlpatterns = [
 
     path('vendors/<int:vendor_id>/products/',ProductListCreateAPIView.as_view(), name='product-list-create'),
     path('vendors/<int:vendor_id>/products/<int:pk>/',ProductDetailAPIView.as_view(),name='product-detail' ),
+    path('vendors/<int:vendor_id>/products/search/',ProductSearchAPIView.as_view(),name='product-search' ),
+    path('vendors/<int:vendor_id>/products/export/',ProductExportAPIView.as_view(),name='product-export' ),
+    path('vendors/<int:vendor_id>/products/import/',ProductImportAPIView.as_view(),name='product-import' ),
+
+    path('vendors/<int:vendor_id>/customers/import/',CustomerImportAPIView.as_view(),name='customer-import' ),
 
     path('vendors/<int:vendor_id>/orders/',OrderListCreateAPIView.as_view(),name='order-list-create' ),
     path('vendors/<int:vendor_id>/orders/<int:pk>/',OrderDetailAPIView.as_view(),name='order-detail' ),
+    path('vendors/<int:vendor_id>/orders/bulk/',OrderBulkCreateAPIView.as_view(),name='order-bulk-create' ),
+    path('vendors/<int:vendor_id>/orders/export/',OrderExportAPIView.as_view(),name='order-export' ),
+
+    path('vendors/<int:vendor_id>/dashboard/sales/',VendorSalesDashboardAPIView.as_view(),name='vendor-sales-dashboard' ),
 
     path('vendors/<int:vendor_id>/',AssignVendorRoleAPIView.as_view(),name='assign-vendor-role' ),
 
+    # Async read path for ASGI deployments; same responses as the views above.
+    path('async/vendors/', AsyncVendorListView.as_view(), name='vendor-list-async'),
+    path('async/vendors/<int:vendor_id>/products/', AsyncProductListView.as_view(), name='product-list-async'),
+    path('async/vendors/<int:vendor_id>/products/<int:pk>/', AsyncProductDetailView.as_view(), name='product-detail-async'),
+    path('async/vendors/<int:vendor_id>/orders/', AsyncOrderListView.as_view(), name='order-list-async'),
+    path('async/vendors/<int:vendor_id>/orders/<int:pk>/', AsyncOrderDetailView.as_view(), name='order-detail-async'),
+
 ]
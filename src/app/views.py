@@ -1,141 +1,456 @@
 # app/views.py
+import json
+
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from rest_framework import generics, status
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from accounts.models import User
+from accounts.onboarding import hash_pool, onboard_users
 
-from app.models import Vendor, Product, Order, OrderItem, UserVendorRole
+from app.models import Vendor, Product, Order, OrderItem, UserVendorRole, VendorSalesRollup
 from app.serializers import (
     AssignRoleSerializer,
     VendorSerializer,
     ProductSerializer,
     OrderSerializer,
+    OrderIngestSerializer,
+    ProductSearchSerializer,
     UserVendorRoleSerializer,
+    VendorSalesRollupSerializer,
+)
+from app.exports import (
+    ORDER_EXPORT_FIELDS,
+    PRODUCT_EXPORT_FIELDS,
+    iter_order_lines,
+    iter_products,
+    parse_day,
+    stream_csv,
+    stream_ndjson,
 )
+from app.catalog import catalog_response_key, catalog_version, get_or_build, response_timeout
+from app.ingest import import_products, ingest_orders, iter_csv_records, iter_records
+from app.idempotency import idempotent
+from app.pagination import CreatedAtCursorPagination
+from app.roles import request_role
+from app.search import search_products
+
+def product_queryset(vendor):
+    return Product.objects.filter(vendor=vendor).select_related("vendor__user")
+
+# Lines in the order they were placed; (order_id, id) is served by the order FK index
+# without a sort, unlike the model's default -created_at ordering.
+ORDER_ITEMS = OrderItem.objects.select_related("product").order_by("order_id", "id")
+
+def order_queryset(vendor):
+    # Loads an order page with its customer, vendor owner and line items in two queries.
+    return (
+        Order.objects
+        .filter(vendor=vendor)
+        .select_related("customer", "vendor__user")
+        .prefetch_related(
+            Prefetch("items", queryset=ORDER_ITEMS)
+        )
+    )
+
+
+class TenantMixin:
+    """
+    Vendor and role lookups for tenant-scoped views.
+
+    The vendor comes from ``request.tenant`` (set by ``TenantMiddleware``) and the
+    user's role is resolved at most once per request.
+    """
+
+    def get_vendor(self):
+        vendor = getattr(self.request, "tenant", None)
+        if vendor is None:
+            raise Http404("Vendor not found")
+        return vendor
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["vendor"] = getattr(self.request, "tenant", None)
+        return context
+
+    def get_role(self, vendor):
+        roles = self.__dict__.setdefault("_vendor_roles", {})
+        if vendor.pk not in roles:
+            roles[vendor.pk] = request_role(self.request, vendor)
+        return roles[vendor.pk]
+
+
+class CatalogConditionalMixin:
+    """
+    Conditional and cached GET for catalog views, keyed on the vendor's catalog version.
+
+    A matching ``If-None-Match`` or ``If-Modified-Since`` is answered with 304 after
+    authentication, from the cache alone: no serialization, and no product query
+    beyond ``object_exists``. Other successful responses are shared through the
+    ``catalog`` cache until the catalog changes.
+    """
+
+    def get(self, request, *args, **kwargs):
+        vendor = self.get_vendor()
+        version = catalog_version(vendor.pk)
+        etag = f'"{vendor.pk}-{version}"'
+        last_modified = version // 10**9
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None or not self.object_exists(*args, **kwargs):
+            response = self.get_cached(request, vendor, version, *args, **kwargs)
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-def get_user_role(user, vendor):
-    try:
-        role = UserVendorRole.objects.get(user=user, vendor=vendor).role
-        return role
-    except UserVendorRole.DoesNotExist:
-        return None
+    def get_cached(self, request, vendor, version, *args, **kwargs):
+        built = []
 
-def is_owner(user, vendor):
-    return get_user_role(user, vendor) == UserVendorRole.ROLE_OWNER
+        def build():
+            response = super(CatalogConditionalMixin, self).get(request, *args, **kwargs)
+            built.append(response)
+            return response.data if response.status_code == status.HTTP_200_OK else None
 
-def is_staff(user, vendor):
-    return get_user_role(user, vendor) == UserVendorRole.ROLE_STAFF
+        data = get_or_build(catalog_response_key(vendor.pk, version, request), build, response_timeout())
+        return built[0] if built else Response(data)
 
-def is_customer(user, vendor):
-    return get_user_role(user, vendor) == UserVendorRole.ROLE_CUSTOMER
+    def object_exists(self, *args, **kwargs):
+        """Checked before a 304: the version is per vendor, so its ETag matches any URL under it."""
+        return True
 
 
 class VendorListCreateAPIView(generics.ListCreateAPIView):
     serializer_class = VendorSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
-        return Vendor.objects.filter(user=self.request.user)
+        return Vendor.objects.filter(user_id=self.request.user.pk).select_related("user")
 
     def perform_create(self, serializer):
         serializer.save()  
 
-class ProductListCreateAPIView(generics.ListCreateAPIView):
+class ProductListCreateAPIView(CatalogConditionalMixin, TenantMixin, generics.ListCreateAPIView):
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
-
-    def get_vendor(self):
-        return Vendor.objects.get(id=self.kwargs["vendor_id"])
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
-        vendor = self.get_vendor()
-        return Product.objects.filter(vendor=vendor)
+        return product_queryset(self.get_vendor())
 
     def perform_create(self, serializer):
         vendor = self.get_vendor()
-        user = self.request.user
 
-        if not (is_owner(user, vendor) or is_staff(user, vendor)):
-            raise PermissionError("You do not have permission to add products.")
+        if self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            raise PermissionDenied("You do not have permission to add products.")
 
         serializer.save(vendor=vendor) 
 
 
-class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailAPIView(CatalogConditionalMixin, TenantMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_vendor(self):
-        return Vendor.objects.get(id=self.kwargs["vendor_id"])
-
     def get_queryset(self):
-        vendor = self.get_vendor()
-        return Product.objects.filter(vendor=vendor)
+        return product_queryset(self.get_vendor())
+
+    def object_exists(self, vendor_id, pk):
+        return self.get_queryset().filter(pk=pk).exists()
 
     def perform_update(self, serializer):
         vendor = self.get_vendor()
-        user = self.request.user
 
-        if not (is_owner(user, vendor) or is_staff(user, vendor)):
-            raise PermissionError("You cannot update this product.")
+        if self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            raise PermissionDenied("You cannot update this product.")
 
         serializer.save()
 
     def perform_destroy(self, instance):
         vendor = self.get_vendor()
-        user = self.request.user
 
-        if not is_owner(user, vendor):
-            raise PermissionError("Only owner can delete products.")
+        if self.get_role(vendor) != UserVendorRole.ROLE_OWNER:
+            raise PermissionDenied("Only owner can delete products.")
 
         instance.delete()
 
-class OrderListCreateAPIView(generics.ListCreateAPIView):
-    serializer_class = OrderSerializer
+class ProductSearchAPIView(TenantMixin, generics.GenericAPIView):
+    """
+    Full-text product search within a vendor, best match first.
+
+    ``?q=`` terms are matched as prefixes against name and description. Optional
+    filters: ``min_price``, ``max_price``, ``in_stock=1``, and ``is_active``
+    (``true`` by default, ``false``, or ``all``). Paged with ``limit`` / ``offset``.
+    """
+    serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_vendor(self):
-        return Vendor.objects.get(id=self.kwargs["vendor_id"])
+    def get(self, request, vendor_id):
+        vendor = self.get_vendor()
+
+        serializer = ProductSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+
+        products = search_products(
+            vendor,
+            filters["q"],
+            is_active={"true": True, "false": False, "all": None}[filters["is_active"]],
+            min_price=filters.get("min_price"),
+            max_price=filters.get("max_price"),
+            in_stock=filters["in_stock"],
+            limit=filters["limit"],
+            offset=filters["offset"],
+        )
+        return Response({"results": self.get_serializer(products, many=True).data})
+
+class ProductExportAPIView(TenantMixin, generics.GenericAPIView):
+    """Streams the vendor's catalog as CSV (default) or NDJSON (``?type=ndjson``)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, vendor_id):
+        vendor = self.get_vendor()
+
+        if self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            return Response(
+                {"error": "Only vendor owner or staff can export the catalog"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        rows = iter_products(vendor)
+        if request.query_params.get("type") == "ndjson":
+            response = StreamingHttpResponse(
+                stream_ndjson(PRODUCT_EXPORT_FIELDS, rows), content_type="application/x-ndjson"
+            )
+            filename = f"products-{vendor.pk}.ndjson"
+        else:
+            response = StreamingHttpResponse(stream_csv(PRODUCT_EXPORT_FIELDS, rows), content_type="text/csv")
+            filename = f"products-{vendor.pk}.csv"
+
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+class ProductImportAPIView(TenantMixin, generics.GenericAPIView):
+    """
+    Upserts products by name from a CSV (``text/csv``, with a header row) or NDJSON body.
+
+    Rows are read from the request stream and written in bulk batches; the response
+    reports created, updated and failed counts.
+    """
+    serializer_class = ProductSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, vendor_id):
+        vendor = self.get_vendor()
+
+        if self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            return Response(
+                {"error": "Only vendor owner or staff can import products"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        lines = request.stream or ()
+        if request.content_type.startswith("text/csv"):
+            records = iter_csv_records(lines)
+        else:
+            records = iter_records(lines)
+
+        return idempotent(
+            request, vendor, lambda: Response(import_products(vendor, records), status=status.HTTP_200_OK)
+        )
+
+class CustomerImportAPIView(TenantMixin, generics.GenericAPIView):
+    """
+    Onboards a merchant's customer base from a CSV (``text/csv``) or NDJSON body.
+
+    Rows are ``email`` plus an optional ``password``, ``first_name``, ``last_name``
+    and ``phone_number``. Users are created in bulk and become customers of the
+    vendor; emails that already have an account are skipped and not enrolled.
+    Password hashes are only taken by the ``onboard_users`` command; passwords are
+    hashed once each across a thread pool before the users are inserted. Owner only.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, vendor_id):
+        vendor = self.get_vendor()
+
+        if self.get_role(vendor) != UserVendorRole.ROLE_OWNER:
+            return Response(
+                {"error": "Only vendor owner can import customers"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        lines = request.stream or ()
+        if request.content_type.startswith("text/csv"):
+            records = iter_csv_records(lines)
+        else:
+            records = iter_records(lines)
+
+        return idempotent(request, vendor, lambda: Response(
+            onboard_users(records, vendor=vendor, executor=hash_pool(), allow_password_hash=False),
+            status=status.HTTP_200_OK,
+        ))
+
+class OrderListCreateAPIView(TenantMixin, generics.ListCreateAPIView):
+    serializer_class = OrderSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         vendor = self.get_vendor()
         user = self.request.user
-        role = get_user_role(user, vendor)
+        role = self.get_role(vendor)
 
         if role in [UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF]:
-            return Order.objects.filter(vendor=vendor)
+            return order_queryset(vendor)
 
-        return Order.objects.filter(vendor=vendor, customer=user)
+        return order_queryset(vendor).filter(customer_id=user.pk)
+
+    def create(self, request, *args, **kwargs):
+        # A retried POST with the same Idempotency-Key gets the first order back.
+        create = super().create
+        return idempotent(request, self.get_vendor(), lambda: create(request, *args, **kwargs), payload=request.data)
 
     def perform_create(self, serializer):
         vendor = self.get_vendor()
         user = self.request.user
 
-        if not is_customer(user, vendor):
-            raise PermissionError("Only customers can place orders.")
+        if self.get_role(vendor) != UserVendorRole.ROLE_CUSTOMER:
+            raise PermissionDenied("Only customers can place orders.")
 
-        serializer.save(customer=user)
+        serializer.save(customer_id=user.pk, vendor=vendor)
 
-class OrderDetailAPIView(generics.RetrieveUpdateAPIView):
+class OrderDetailAPIView(TenantMixin, generics.RetrieveUpdateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_vendor(self):
-        return Vendor.objects.get(id=self.kwargs["vendor_id"])
-
     def get_queryset(self):
-        vendor = self.get_vendor()
-        return Order.objects.filter(vendor=vendor)
+        return order_queryset(self.get_vendor())
 
     def perform_update(self, serializer):
         vendor = self.get_vendor()
-        user = self.request.user
 
-        if not (is_owner(user, vendor) or is_staff(user, vendor)):
-            raise PermissionError("You cannot update this order.")
+        if self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            raise PermissionDenied("You cannot update this order.")
 
         serializer.save()
 
+class OrderBulkCreateAPIView(TenantMixin, generics.GenericAPIView):
+    """
+    Ingests a newline-delimited JSON feed of orders.
+
+    Each line is ``{"customer": <user id>, "items": [{"product": <id>, "quantity": <n>}]}``.
+    The body is read and written in chunks, and one NDJSON result per input line is
+    streamed back, followed by a summary line.
+    """
+    serializer_class = OrderIngestSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, vendor_id):
+        vendor = self.get_vendor()
+
+        if self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            return Response(
+                {"error": "Only vendor owner or staff can import orders"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        return idempotent(request, vendor, lambda: StreamingHttpResponse(
+            self.render_results(ingest_orders(vendor, request.stream or ())),
+            content_type="application/x-ndjson",
+        ))
+
+    def render_results(self, results):
+        created = failed = 0
+        for result in results:
+            if result["status"] == "created":
+                created += 1
+            else:
+                failed += 1
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"created": created, "failed": failed}) + "\n"
+
+class OrderExportAPIView(TenantMixin, generics.GenericAPIView):
+    """
+    Streams one CSV row per order line for accounting.
+
+    ``?start=YYYY-MM-DD&end=YYYY-MM-DD`` limits the export to orders created on or
+    after ``start`` and before ``end`` (local time).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, vendor_id):
+        vendor = self.get_vendor()
+
+        if self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            return Response(
+                {"error": "Only vendor owner or staff can export orders"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            start = parse_day(request.query_params.get("start"))
+            end = parse_day(request.query_params.get("end"))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = iter_order_lines(vendor, start, end)
+        response = StreamingHttpResponse(stream_csv(ORDER_EXPORT_FIELDS, rows), content_type="text/csv")
+        response["Content-Disposition"] = f'attachment; filename="orders-{vendor.pk}.csv"'
+        return response
+
+class VendorSalesDashboardAPIView(TenantMixin, generics.GenericAPIView):
+    """
+    Orders, revenue and units sold per day and status, plus totals per status.
+
+    Reads only the sales rollups. ``?start=YYYY-MM-DD&end=YYYY-MM-DD`` limits the
+    range to days on or after ``start`` and before ``end``.
+    """
+    serializer_class = VendorSalesRollupSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, vendor_id):
+        vendor = self.get_vendor()
+
+        if self.get_role(vendor) not in (UserVendorRole.ROLE_OWNER, UserVendorRole.ROLE_STAFF):
+            return Response(
+                {"error": "Only vendor owner or staff can view sales"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            start = parse_day(request.query_params.get("start"))
+            end = parse_day(request.query_params.get("end"))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = VendorSalesRollup.objects.filter(vendor=vendor)
+        if start is not None:
+            rollups = rollups.filter(day__gte=start.date())
+        if end is not None:
+            rollups = rollups.filter(day__lt=end.date())
+
+        rows = list(rollups)
+        totals = {}
+        for row in rows:
+            total = totals.setdefault(row.status, {"order_count": 0, "revenue": 0, "units": 0})
+            total["order_count"] += row.order_count
+            total["revenue"] += row.revenue
+            total["units"] += row.units
+
+        return Response({
+            "results": self.get_serializer(rows, many=True).data,
+            "totals": {
+                key: {**total, "revenue": f"{total['revenue']:.2f}"} for key, total in totals.items()
+            },
+        })
+
 class AssignVendorRoleAPIView(generics.GenericAPIView):
     serializer_class = AssignRoleSerializer
     permission_classes = [IsAuthenticated]
@@ -147,23 +462,21 @@ class AssignVendorRoleAPIView(generics.GenericAPIView):
         user_id = serializer.validated_data["user_id"]
         role = serializer.validated_data["role"]
 
-        try:
-            vendor = Vendor.objects.get(id=vendor_id)
-        except Vendor.DoesNotExist:
+        vendor = getattr(request, "tenant", None)
+        if vendor is None:
             return Response({"error": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            owner_role = UserVendorRole.objects.get(user=request.user, vendor=vendor).role
-            if owner_role != UserVendorRole.ROLE_OWNER:
-                return Response(
-                    {"error": "Only vendor owner can assign roles"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-        except UserVendorRole.DoesNotExist:
+        owner_role = request_role(request, vendor)
+        if owner_role is None:
             return Response(
                 {"error": "You don't belong to this vendor"},
                 status=status.HTTP_403_FORBIDDEN
             )
+        if owner_role != UserVendorRole.ROLE_OWNER:
+            return Response(
+                {"error": "Only vendor owner can assign roles"},
+                status=status.HTTP_403_FORBIDDEN
+            )
 
         try:
             target_user = User.objects.get(id=user_id)
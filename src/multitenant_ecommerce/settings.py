@@ -49,11 +49,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.MetricsMiddleware',
+    'app.middleware.ReplicaReadMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.middleware.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,6 +91,129 @@ DATABASES = {
     }
 }
 
+# Read replicas, as a comma-separated list of SQLite files in DATABASE_REPLICAS
+# (kept in step with `manage.py sync_replicas`). GET/HEAD/OPTIONS requests read
+# from them until they write; see app.routers.
+for number, path in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+
+# Tenant shards, as a comma-separated list of SQLite files in DATABASE_SHARDS
+# (`manage.py migrate --database shardN` creates them). Vendors live on the
+# default database until `manage.py move_vendor` moves them; see app.shards.
+for number, path in enumerate(filter(None, os.environ.get('DATABASE_SHARDS', '').split(',')), 1):
+    DATABASES[f'shard{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / path.strip(),
+    }
+
+DATABASE_SHARDS = [alias for alias in DATABASES if alias.startswith('shard')]
+
+DATABASE_ROUTERS = ['app.routers.ShardRouter', 'app.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    # Holds role versions, which revoke the role claims of issued tokens, role
+    # lookups and the vendor map versions. Several worker processes must share
+    # it (Redis, Memcached); see SINGLE_WORKER_PROCESS.
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'multitenant-ecommerce',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Rendered product listings, keyed by catalog version; least recently used
+    # entries are culled past MAX_ENTRIES. Point at a shared backend (Redis,
+    # Memcached) to share entries between workers.
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'multitenant-ecommerce-catalog',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    # Responses stored for Idempotency-Key retries; TIMEOUT is how long a key is
+    # remembered. Must be shared by all workers for keys to hold across them.
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'multitenant-ecommerce-idempotency',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Token buckets of TenantRateThrottle. The throttle relies on atomic incr,
+    # which Redis and Memcached provide; share the backend between workers so
+    # that quotas hold across them.
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'multitenant-ecommerce-throttle',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# Requests per vendor (all of its traffic) and per user within a vendor, as
+# "<count>/<s|min|hour|day>"; None lifts a limit. TENANT_THROTTLE_QUOTAS
+# overrides them per vendor id, e.g. {42: {'vendor': '30000/min'}}.
+TENANT_THROTTLE_RATES = {
+    'vendor': '6000/min',
+    'user': '600/min',
+}
+TENANT_THROTTLE_QUOTAS = {}
+
+# Vendors are found by Host header: an exact Vendor.domain, or
+# <Vendor.subdomain>.<one of these>, e.g. "shop.example.com" for
+# acme.shop.example.com. Other hosts resolve to no vendor.
+TENANT_BASE_DOMAINS = [
+    domain.lower() for domain in filter(None, os.environ.get('TENANT_BASE_DOMAINS', '').split(','))
+]
+
+# LocMemCache is per process, so a role revoked on one worker would stay
+# trusted on the others. Unless this says a single process serves every request
+# (runserver), token role claims are not trusted while the default cache is a
+# LocMemCache and users are loaded from the database instead.
+SINGLE_WORKER_PROCESS = os.environ.get('SINGLE_WORKER_PROCESS', str(DEBUG)).lower() in ('1', 'true')
+
+# Seconds a (user, vendor) role lookup stays cached; entries are also
+# dropped whenever the UserVendorRole row is saved or deleted. Changes that skip
+# model signals (queryset update(), raw SQL) show up only after this long.
+# Lookups are not cached while the default cache is a per-process LocMemCache
+# and SINGLE_WORKER_PROCESS is off.
+ROLE_CACHE_TIMEOUT = 300
+
+
+# Performance metrics
+# Scraped from /metrics/, which only answers INTERNAL_IPS.
+
+INTERNAL_IPS = ['127.0.0.1']
+
+# Requests slower than this many seconds are logged to "app.performance" with
+# their slowest SQL statements; None turns the log off.
+SLOW_REQUEST_SECONDS = None
+SLOW_REQUEST_TOP_QUERIES = 5
+
+
+# Threads hashing passwords for bulk customer imports; None uses the CPU count.
+PASSWORD_HASH_WORKERS = None
+
+
+# Order status mails are sent by the task worker (manage.py run_tasks); the
+# console backend prints them until a real mail server is configured.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'orders@localhost')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -148,6 +274,11 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        # Builds the user from token claims; see app/tokens.py.
+        'app.tokens.ClaimsJWTAuthentication',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': [
+        # Token buckets per vendor and user; see TENANT_THROTTLE_RATES.
+        'app.throttling.TenantRateThrottle',
+    ],
 }
\ No newline at end of file
@@ -19,7 +19,9 @@ from django.contrib import admin
 from django.urls import path
 from django.urls import include
 from django.conf.urls.static import static
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from accounts.views import TokenObtainPairWithRolesView, TokenRefreshWithRolesView
+
+from app.metrics import metrics_view
 
 
 
@@ -28,8 +30,10 @@ urlpatterns = [
     path('app/', include('app.urls')),
     path('accounts/', include('accounts.urls')),
 
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),        
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),       
+    path('api/token/', TokenObtainPairWithRolesView.as_view(), name='token_obtain_pair'),        
+    path('api/token/refresh/', TokenRefreshWithRolesView.as_view(), name='token_refresh'),       
+
+    path('metrics/', metrics_view, name='metrics'),
     
 
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)